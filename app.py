@@ -3,14 +3,44 @@ ScenicSync - Take the long way. On purpose.
 Complete scenic route planning with attractions, dining, and utilities
 """
 
+import time
 import streamlit as st
-from streamlit_folium import st_folium
 from urllib.parse import quote
 
 # Import our modules
 from config import *
 from services import GoogleMapsServices
-from utils import apply_custom_css, get_place_type_options, format_place_card, get_scenic_routes
+from utils import apply_custom_css, get_place_type_options, format_place_card, get_scenic_routes, render_debug_panel
+from metrics import start_metrics_server, timed, write_metrics_file
+from bundles import get_curated_bundle
+from async_services import run_trip_pipeline
+
+def discover_places_live(maps_service, live_area, route, start_coords, end_coords, waypoints, place_types, search_radius):
+    """Stream place discovery into the main area so results show up as they arrive"""
+    places = []
+    last_render = 0
+    
+    for places, searches_done, total_searches in maps_service.stream_places_along_route(
+        start_coords,
+        end_coords,
+        place_types,
+        search_radius,
+        route=route
+    ):
+        now = time.monotonic()
+        if searches_done < total_searches and now - last_render < LIVE_RESULTS_INTERVAL:
+            continue
+        last_render = now
+        
+        with live_area.container():
+            progress = searches_done / total_searches if total_searches else 1.0
+            st.progress(progress, text=f"🔍 {len(places)} places found ({searches_done}/{total_searches} searches done)")
+            # Snapshots are shown once, so they bypass the shared cache that keeps finished maps
+            live_map_html = maps_service.render_route_map_html(route, start_coords, end_coords, waypoints, places)
+            st.components.v1.html(live_map_html, height=MAP_HEIGHT)
+    
+    live_area.empty()
+    return places
 
 def main():
     # Page setup
@@ -23,6 +53,7 @@ def main():
     
     # Apply styling
     apply_custom_css()
+    start_metrics_server()
     
     # Get API key from Streamlit secrets (this ensures it's loaded after Streamlit starts)
     api_key = ""
@@ -62,6 +93,9 @@ def main():
     if 'discovered_places' not in st.session_state:
         st.session_state.discovered_places = []
     
+    # Main-area slot for places that stream in while a route is being generated
+    live_area = st.empty()
+    
     # Sidebar for route planning
     with st.sidebar:
         st.header("🗺️ Plan Your Route")
@@ -86,6 +120,11 @@ def main():
                 placeholder="e.g., Bar Harbor, ME"
             )
             
+            stops_text = st.text_area(
+                "Stops Along the Way (optional)",
+                placeholder="One place per line, e.g.\nPortsmouth, NH\nPortland, ME"
+            )
+            
             # Quick location buttons
             st.write("**Quick Locations:**")
             col1, col2 = st.columns(2)
@@ -103,6 +142,7 @@ def main():
             # Route options
             st.subheader("⚙️ Route Options")
             avoid_highways = st.checkbox("Avoid major highways", value=True)
+            optimize_stops = st.checkbox("Reorder stops for the shortest drive", value=True)
             
             # Place discovery options
             st.subheader("🔍 Discover Places")
@@ -141,29 +181,43 @@ def main():
             discover_places = st.checkbox("Find attractions & amenities", value=True, key="predefined_discover")
             
             if discover_places:
-                selected_place_types = ['restaurant', 'tourist_attraction', 'gas_station', 'lodging']
-                search_radius = 30
+                selected_place_types = CURATED_PLACE_TYPES
+                search_radius = CURATED_SEARCH_RADIUS_KM
         
         # Generate route button
         if st.button("🚀 Generate Route", type="primary", use_container_width=True):
             with st.spinner("Creating your scenic route..."):
                 if route_type == "Custom Route" and start_location and end_location:
-                    # Custom route logic
-                    start_coords = maps_service.geocode_location(start_location)
+                    # Custom route logic: geocode start, end and stops at once, then route;
+                    # places still stream in below so they show up as they arrive
+                    trip = run_trip_pipeline(
+                        maps_service,
+                        start_location,
+                        end_location,
+                        stop_names=[line.strip() for line in stops_text.splitlines() if line.strip()],
+                        avoid_highways=avoid_highways,
+                        optimize_stops=optimize_stops
+                    )
+                    for warning in trip['warnings']:
+                        st.warning(warning)
+                    start_coords, end_coords, route = trip['start_coords'], trip['end_coords'], trip['route']
                     
                     if start_coords:
                         st.success(f"✅ Found {start_location}")
-                        end_coords = maps_service.geocode_location(end_location)
                         
                         if end_coords:
                             st.success(f"✅ Found {end_location}")
                             
-                            # Get route
-                            route = maps_service.get_directions(
-                                start_coords, 
-                                end_coords, 
-                                avoid_highways=avoid_highways
-                            )
+                            for stop_name in trip['missing_stops']:
+                                st.warning(f"Could not find stop: {stop_name}")
+                            waypoints = [
+                                {
+                                    'name': stop_name,
+                                    'coords': stop_coords,
+                                    'description': f"A stop on your way to {end_location}"
+                                }
+                                for stop_name, stop_coords in trip['stops']
+                            ]
                             
                             if route:
                                 st.session_state.route_data = {
@@ -172,20 +226,26 @@ def main():
                                     'end_coords': end_coords,
                                     'start_name': start_location,
                                     'end_name': end_location,
-                                    'waypoints': [],
+                                    'waypoints': waypoints,
+                                    'stops': [waypoint['coords'] for waypoint in waypoints],
                                     'route_name': f"{start_location} to {end_location}"
                                 }
                                 
                                 # Discover places along route
                                 if discover_places and selected_place_types:
                                     with st.spinner("🔍 Discovering attractions and amenities..."):
-                                        places = maps_service.find_places_along_route(
+                                        places = discover_places_live(
+                                            maps_service,
+                                            live_area,
+                                            route,
                                             start_coords, 
                                             end_coords, 
+                                            waypoints,
                                             selected_place_types,
                                             search_radius
                                         )
                                         st.session_state.discovered_places = places
+                                        maps_service.prefetch_place_details(places)
                                         st.success(f"🎉 Found {len(places)} places along your route!")
                                 else:
                                     st.session_state.discovered_places = []
@@ -208,7 +268,21 @@ def main():
                         start_coords = waypoints[0]['coords']
                         end_coords = waypoints[-1]['coords']
                         
-                        route = maps_service.get_directions(start_coords, end_coords)
+                        # Prefer the precompiled bundle; once it is stale, only while the API is unavailable
+                        route, places = None, None
+                        bundle = get_curated_bundle()
+                        if bundle is not None and (bundle.is_fresh() or not maps_service.can_call('directions')):
+                            with timed('curated_load'):
+                                route = bundle.route(selected_route, waypoints)
+                                if route is not None and discover_places:
+                                    places = bundle.places(selected_route, waypoints, selected_place_types, search_radius)
+                        
+                        if route is None:
+                            route = maps_service.get_directions(
+                                start_coords,
+                                end_coords,
+                                [waypoint['coords'] for waypoint in waypoints[1:-1]]
+                            )
                         
                         if route:
                             st.session_state.route_data = {
@@ -218,19 +292,26 @@ def main():
                                 'start_name': waypoints[0]['name'],
                                 'end_name': waypoints[-1]['name'],
                                 'waypoints': waypoints,
+                                'stops': [waypoint['coords'] for waypoint in waypoints[1:-1]],
                                 'route_name': selected_route
                             }
                             
                             # Discover places for predefined routes
                             if discover_places:
                                 with st.spinner("🔍 Discovering attractions and amenities..."):
-                                    places = maps_service.find_places_along_route(
-                                        start_coords, 
-                                        end_coords, 
-                                        selected_place_types,
-                                        search_radius
-                                    )
+                                    if places is None:
+                                        places = discover_places_live(
+                                            maps_service,
+                                            live_area,
+                                            route,
+                                            start_coords, 
+                                            end_coords, 
+                                            waypoints,
+                                            selected_place_types,
+                                            search_radius
+                                        )
                                     st.session_state.discovered_places = places
+                                    maps_service.prefetch_place_details(places)
                                     st.success(f"🎉 Found {len(places)} places along your route!")
                             
                             st.success("🎉 Route loaded!")
@@ -238,6 +319,9 @@ def main():
                 
                 else:
                     st.error("Please fill in all fields")
+        
+        if SHOW_DEBUG_PANEL:
+            render_debug_panel()
     
     # MAIN CONTENT AREA - Always show, regardless of route status
     
@@ -265,7 +349,11 @@ def main():
         
         # Google Maps link - RIGHT AFTER STATS, BEFORE MAP
         st.markdown("---")
-        maps_link = f"https://www.google.com/maps/dir/{quote(route_data['start_name'])}/{quote(route_data['end_name'])}"
+        # Intermediate stops go in as coordinates, so Google routes through the same points as the map
+        maps_path = [quote(route_data['start_name'])]
+        maps_path += [f"{stop[0]},{stop[1]}" for stop in route_data.get('stops', [])]
+        maps_path.append(quote(route_data['end_name']))
+        maps_link = "https://www.google.com/maps/dir/" + "/".join(maps_path)
         
         # Create columns for buttons
         btn_col1, btn_col2, btn_col3 = st.columns([1, 2, 1])
@@ -281,7 +369,8 @@ def main():
         # Create and display map - AFTER GOOGLE MAPS BUTTON
         st.subheader("🗺️ Interactive Route Map")
         
-        route_map = maps_service.create_route_map(
+        # Built once per route and place set; reruns (e.g. a Details click) reuse the cached HTML
+        route_map_html = maps_service.get_route_map_html(
             route,
             route_data['start_coords'],
             route_data['end_coords'],
@@ -289,8 +378,8 @@ def main():
             places
         )
         
-        # Display map with proper sizing
-        map_data = st_folium(route_map, height=MAP_HEIGHT, use_container_width=True)
+        # A static iframe: panning and zooming stay in the browser instead of rerunning the script
+        st.components.v1.html(route_map_html, height=MAP_HEIGHT)
         
         # Places discovery results
         if places:
@@ -434,6 +523,8 @@ def main():
         4. **Generate Route**: Click the button and explore your journey!
         5. **Explore Results**: View map, places, and export to Google Maps
         """)
+    
+    write_metrics_file()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,386 @@
+"""
+Asyncio Google Maps client for ScenicSync
+
+AsyncGoogleMapsServices mirrors GoogleMapsServices on aiohttp, so a whole
+route-generation pipeline (geocode -> directions -> places) can run as a few
+gathers on one event loop: start, end and stops geocode together, and every
+Places search overlaps. Caches, fallbacks and response parsing are borrowed
+from the wrapped GoogleMapsServices; retries, rate limits, the quota ledger
+and record/replay fixtures from the shared GoogleTransport, so both clients
+account for calls the same way. Cache, ledger and CPU-heavy work runs in
+worker threads so it never stalls the loop.
+
+Everything runs on one process-wide background event loop, keeping a single
+aiohttp connection pool across calls. Synchronous code (the Streamlit script,
+batch workers) uses run_trip_pipeline, which blocks until the trip is planned.
+"""
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import time
+import aiohttp
+import requests
+from config import *
+from cache import normalize_place_name
+from transport import GOOGLE_ENDPOINTS, get_transport, request_key
+from geo import RouteCorridor
+from place_filters import collapse_duplicate_places, dedupe_places
+from services import GoogleAPIError, PlacesSearch
+from stages import directions_stage
+from metrics import record_api_call, registry, timed
+from stop_order import optimize_stop_order
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, requests.ConnectionError, requests.Timeout)
+
+
+def to_requests_response(url, status, headers, body, encoding=None):
+    """Wrap a finished aiohttp response as a requests.Response, the type every parser expects"""
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    response.encoding = encoding or 'utf-8'
+    response._content = body
+    response.url = url
+    return response
+
+
+class AsyncGoogleTransport:
+    """aiohttp counterpart of GoogleTransport, sharing its rate limits, quota ledger and fixtures"""
+
+    def __init__(self, transport, max_concurrency=ASYNC_MAX_CONCURRENCY):
+        self.transport = transport
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = {} if SINGLE_FLIGHT_ENABLED else None
+        self.session = None
+
+    def get_session(self):
+        """The shared keep-alive session, created on first use inside the loop"""
+        if self.session is None or self.session.closed:
+            # The semaphore bounds in-flight requests, so the pool only needs one connection for each
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_concurrency))
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def get(self, endpoint, params):
+        """GET a Google endpoint by name, sharing identical in-flight requests"""
+        if self.in_flight is None:
+            return await self.fetch(endpoint, params)
+
+        key = request_key(endpoint, params)
+        task = self.in_flight.get(key)
+        if task is not None:
+            registry.inc('scenicsync_singleflight_shared_total', {'endpoint': endpoint})
+        else:
+            task = self.in_flight[key] = asyncio.ensure_future(self.fetch(endpoint, params))
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        # A cancelled waiter must not cancel the call other waiters share
+        return await asyncio.shield(task)
+
+    async def fetch(self, endpoint, params):
+        """GET a Google endpoint by name, retrying transient failures"""
+        url = GOOGLE_ENDPOINTS[endpoint]
+        timeout = aiohttp.ClientTimeout(
+            sock_connect=HTTP_CONNECT_TIMEOUT,
+            sock_read=ENDPOINT_TIMEOUTS.get(endpoint, REQUEST_TIMEOUT)
+        )
+
+        attempt = 0
+        while True:
+            try:
+                response = await self.send(endpoint, url, params, timeout)
+            except TRANSIENT_ERRORS:
+                delay = self.transport.retry_delay(attempt, failed=True)
+                if delay is None:
+                    raise
+            else:
+                delay = self.transport.retry_delay(attempt, response)
+                if delay is None:
+                    return response
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def send(self, endpoint, url, params, timeout):
+        """Make one attempt: served from fixtures in replay mode, otherwise live and billable"""
+        transport = self.transport
+        if transport.player is not None:
+            if transport.player.replay_latency:
+                return await asyncio.to_thread(transport.replay, endpoint, params)
+            return transport.replay(endpoint, params)
+
+        # The ledger is SQLite-backed, so charging it stays off the loop thread
+        if transport.ledger.enabled:
+            await asyncio.to_thread(transport.charge, endpoint)
+        limiter = transport.rate_limiters[endpoint]
+        while True:
+            wait = limiter.try_acquire()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+
+        async with self.semaphore:
+            start = time.perf_counter()
+            try:
+                async with self.get_session().get(url, params=params, timeout=timeout) as raw:
+                    body = await raw.read()
+                    response = to_requests_response(str(raw.url), raw.status, raw.headers, body, raw.charset)
+            except TRANSIENT_ERRORS:
+                record_api_call(endpoint, time.perf_counter() - start, 'error')
+                raise
+        transport.record_live_call(endpoint, params, response, time.perf_counter() - start)
+        return response
+
+
+class AsyncGoogleMapsServices:
+    """Async geocode, directions, nearby search and details on top of a GoogleMapsServices
+
+    Warnings are collected in self.warnings instead of written to the page,
+    since the loop thread has no Streamlit script context.
+    """
+
+    def __init__(self, maps_service, transport=None):
+        self.maps_service = maps_service
+        self.transport = transport or get_async_transport()
+        self.warnings = []
+
+    def warn(self, message):
+        logger.warning(message)
+        self.warnings.append(message)
+
+    async def geocode_location(self, place_name):
+        """Convert place name to coordinates using Google Geocoding API"""
+        maps_service = self.maps_service
+        with timed('geocode'):
+            cached_coords = await asyncio.to_thread(maps_service.geocode_cache.get, normalize_place_name(place_name))
+            if cached_coords:
+                return cached_coords
+
+            if not await asyncio.to_thread(maps_service.can_call, 'geocode'):
+                return await asyncio.to_thread(maps_service.geocode_location_fallback, place_name)
+
+            try:
+                response = await self.transport.get('geocode', maps_service.geocode_params(place_name))
+                return await asyncio.to_thread(maps_service.geocode_from_response, place_name, response)
+            except GoogleAPIError as e:
+                self.warn(str(e))
+            except Exception as e:
+                self.warn(f"Geocoding error: {str(e)}")
+
+            return await asyncio.to_thread(maps_service.geocode_location_fallback, place_name)
+
+    async def geocode_locations(self, place_names):
+        """Geocode several place names concurrently, keeping their order"""
+        return list(await asyncio.gather(*(self.geocode_location(name) for name in place_names)))
+
+    async def get_directions(self, start_coords, end_coords, waypoints=None, avoid_highways=True):
+        """Get directions using Google Directions API, requesting every waypoint chunk at once"""
+        maps_service = self.maps_service
+        with timed('directions'):
+            key = maps_service.directions_key(start_coords, end_coords, waypoints, avoid_highways)
+            route = directions_stage.get(key)
+            if route is not None:
+                return route
+
+            if not await asyncio.to_thread(maps_service.can_call, 'directions'):
+                return await asyncio.to_thread(maps_service.create_simple_route, start_coords, end_coords, waypoints)
+
+            google_routes = await asyncio.gather(*(
+                self.request_directions(chunk, avoid_highways)
+                for chunk in maps_service.directions_chunks(start_coords, end_coords, waypoints)
+            ))
+            if all(google_routes):
+                # Decoding and stitching the polylines is CPU-bound
+                route = await asyncio.to_thread(maps_service.convert_google_routes, google_routes)
+                if route is not None:
+                    directions_stage.set(key, route)
+                return route
+
+            return await asyncio.to_thread(maps_service.create_simple_route, start_coords, end_coords, waypoints)
+
+    async def request_directions(self, stops, avoid_highways=True):
+        """Fetch the first Google route through stops (origin, waypoints..., destination), or None"""
+        try:
+            response = await self.transport.get('directions', self.maps_service.directions_params(stops, avoid_highways))
+            return self.maps_service.directions_from_response(response)
+        except GoogleAPIError as e:
+            self.warn(str(e))
+        except Exception as e:
+            self.warn(f"Directions error: {str(e)}")
+
+        return None
+
+    async def find_places_along_route(self, start_coords, end_coords, place_types, radius_km=50, route=None,
+                                      max_places=MAX_PLACES_PER_SEARCH):
+        """Find places along a route, running every (search point, type) search at once"""
+        maps_service = self.maps_service
+        if not maps_service.api_available:
+            return []
+
+        with timed('places_search'):
+            polyline_points = route.points if route else None
+            path = polyline_points if polyline_points is not None and len(polyline_points) >= 2 else [start_coords, end_coords]
+            search_points = await asyncio.to_thread(maps_service.route_search_points, path, radius_km)
+            radius_meters = radius_km * 1000
+            searches = [(point, place_type) for point in search_points for place_type in place_types]
+            if not await asyncio.to_thread(maps_service.transport.has_budget, 'nearby_search'):
+                memoized = maps_service.memoized_searches(searches, radius_meters)
+                if len(memoized) < len(searches):
+                    self.warn("Google Maps budget reached - only showing places from earlier searches")
+                searches = memoized
+
+            # gather keeps search order, so the result does not depend on arrival order
+            results = await asyncio.gather(*(
+                self.search_places_near_point(point, place_type, radius_meters)
+                for point, place_type in searches
+            ))
+            found = [place for places in results for place in places]
+            if not found:
+                return []
+            return await asyncio.to_thread(self.filter_places, path, radius_km, found, max_places)
+
+    def filter_places(self, path, radius_km, found, max_places):
+        """Keep the places inside the route corridor, without duplicates"""
+        corridor = RouteCorridor(path, min(radius_km, PLACE_CORRIDOR_KM))
+        near_route = corridor.contains([place['coords'] for place in found])
+        places = dedupe_places(place for place, keep in zip(found, near_route) if keep)
+        return collapse_duplicate_places(places)[:max_places]
+
+    async def search_places_near_point(self, coords, place_type, radius_meters):
+        """Search for places near a specific point, following next_page_token; memoized like the sync search"""
+        search = PlacesSearch(self.maps_service, coords, place_type, radius_meters)
+        if search.cached_pages is not None:
+            return [place for page in search.cached_page_copies() for place in page]
+
+        places = []
+        try:
+            while search.next_params is not None:
+                response = await self.transport.get('nearby_search', search.next_params)
+                page = search.handle_response(response)
+                if page is not None:
+                    places.extend(page)
+                if search.next_params is not None:
+                    await asyncio.sleep(search.token_delay)
+        except GoogleAPIError as e:
+            self.warn(str(e))
+        except Exception as e:
+            self.warn(f"Places search error: {str(e)}")
+        return places
+
+    async def get_place_details(self, place_id):
+        """Get detailed information about a specific place"""
+        maps_service = self.maps_service
+        if not maps_service.api_available:
+            return None
+
+        cached_details = await asyncio.to_thread(maps_service.details_cache.get, place_id)
+        if cached_details is not None:
+            return cached_details
+
+        if not await asyncio.to_thread(maps_service.transport.has_budget, 'details'):
+            self.warn("Google Maps budget reached - place details unavailable")
+            return None
+
+        try:
+            response = await self.transport.get('details', maps_service.place_details_params(place_id))
+            return await asyncio.to_thread(maps_service.details_from_response, place_id, response)
+        except GoogleAPIError as e:
+            self.warn(str(e))
+        except Exception as e:
+            self.warn(f"Place details error: {str(e)}")
+
+        return None
+
+    async def plan_trip(self, start_name, end_name, stop_names=(), avoid_highways=True, optimize_stops=False,
+                        place_types=None, radius_km=50, max_places=MAX_PLACES_PER_SEARCH):
+        """Geocode, route and search one trip, overlapping every call that doesn't depend on another
+
+        Returns a dict with start_coords and end_coords (None if not found),
+        stops as (name, coords) pairs in driving order, missing_stops, route
+        (None if it could not be planned), places (empty unless place_types
+        are given) and the warnings raised along the way.
+        """
+        stop_names = list(stop_names)
+        coords = await self.geocode_locations([start_name, end_name] + stop_names)
+        trip = {
+            'start_coords': coords[0],
+            'end_coords': coords[1],
+            'stops': [(name, point) for name, point in zip(stop_names, coords[2:]) if point],
+            'missing_stops': [name for name, point in zip(stop_names, coords[2:]) if not point],
+            'route': None,
+            'places': [],
+            'warnings': self.warnings
+        }
+        start_coords, end_coords, stops = trip['start_coords'], trip['end_coords'], trip['stops']
+        if not (start_coords and end_coords):
+            return trip
+
+        if optimize_stops and len(stops) > 1:
+            order = await asyncio.to_thread(optimize_stop_order, start_coords, [point for name, point in stops], end_coords)
+            stops = trip['stops'] = [stops[i] for i in order]
+
+        route = trip['route'] = await self.get_directions(
+            start_coords, end_coords, [point for name, point in stops], avoid_highways
+        )
+        if route is not None and place_types:
+            trip['places'] = await self.find_places_along_route(
+                start_coords, end_coords, place_types, radius_km, route=route, max_places=max_places
+            )
+        return trip
+
+
+_loop = None
+_loop_pid = None
+_async_transport = None
+_loop_lock = threading.Lock()
+# Loop state a forked worker inherited; kept referenced so its session isn't torn down mid-parent
+_inherited = []
+
+
+def get_event_loop():
+    """Get the process-wide background event loop every async call runs on"""
+    global _loop, _loop_pid, _async_transport
+    with _loop_lock:
+        # A forked worker inherits the loop object but not the thread running it
+        if _loop is None or _loop_pid != os.getpid():
+            if _loop is not None:
+                _inherited.append((_loop, _async_transport))
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            _async_transport = AsyncGoogleTransport(get_transport())
+            threading.Thread(target=_loop.run_forever, name='maps-async', daemon=True).start()
+    return _loop
+
+
+def get_async_transport():
+    """Get the async transport bound to the background event loop"""
+    get_event_loop()
+    return _async_transport
+
+
+def run_sync(coroutine):
+    """Run a coroutine on the background event loop and block until it finishes"""
+    return asyncio.run_coroutine_threadsafe(coroutine, get_event_loop()).result()
+
+
+def run_trip_pipeline(maps_service, start_name, end_name, **kwargs):
+    """Synchronous facade over AsyncGoogleMapsServices.plan_trip for scripts and worker threads"""
+    async def plan():
+        return await AsyncGoogleMapsServices(maps_service).plan_trip(start_name, end_name, **kwargs)
+    return run_sync(plan())
+
+
+@atexit.register
+def _close_session():
+    if _loop is not None and _loop_pid == os.getpid() and _loop.is_running():
+        try:
+            asyncio.run_coroutine_threadsafe(_async_transport.close(), _loop).result(timeout=5)
+        except Exception:
+            pass
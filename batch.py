@@ -0,0 +1,218 @@
+"""
+Headless batch route planning for ScenicSync
+
+Reads route specs from CSV or JSONL and runs geocode -> directions -> places
+for each on a thread or process pool, with each route's independent calls
+overlapping on the async client. One JSON result is appended per line as
+each route finishes. Re-running with the same output file resumes: routes that
+already have a result are skipped.
+
+CSV columns (JSONL keys): id, start, end, stops, place_types, radius_km,
+avoid_highways. Only start and end are required; stops and place_types are
+'|'-separated in CSV and lists in JSONL.
+
+Usage:
+    python batch.py routes.csv results.jsonl --workers 16
+    python batch.py routes.jsonl results.jsonl --executor process --retry-failed
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from config import *
+from async_services import run_trip_pipeline
+from geo import distance_along_path_km
+
+_maps_service = None
+
+
+def read_specs(path):
+    """Yield route spec dicts from a CSV or JSONL file, one at a time"""
+    if path.endswith('.jsonl') or path.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    yield normalize_spec(json.loads(line), line_number)
+    else:
+        with open(path, newline='', encoding='utf-8') as f:
+            for row_number, row in enumerate(csv.DictReader(f), 1):
+                yield normalize_spec(row, row_number)
+
+
+def normalize_spec(spec, number):
+    """Fill in defaults and split '|'-separated CSV lists"""
+    def as_list(value):
+        if isinstance(value, str):
+            return [item.strip() for item in value.split('|') if item.strip()]
+        return list(value or [])
+
+    avoid_highways = spec.get('avoid_highways', True)
+    if isinstance(avoid_highways, str):
+        avoid_highways = avoid_highways.strip().lower() not in ('0', 'false', 'no', '')
+    return {
+        'id': str(spec.get('id') or number),
+        'start': spec['start'],
+        'end': spec['end'],
+        'stops': as_list(spec.get('stops')),
+        'place_types': as_list(spec.get('place_types')) or list(CURATED_PLACE_TYPES),
+        'radius_km': float(spec.get('radius_km') or CURATED_SEARCH_RADIUS_KM),
+        'avoid_highways': avoid_highways
+    }
+
+
+def completed_ids(output_path, retry_failed=False):
+    """Ids that already have a result in the output file, the checkpoint for resuming"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # A run killed mid-write leaves at most one torn last line
+                continue
+            if not (retry_failed and result.get('error')):
+                done.add(result['id'])
+    return done
+
+
+def ensure_line_boundary(path):
+    """Terminate a torn last line, so appended results start on a line of their own"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb+') as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b'\n':
+            f.write(b'\n')
+
+
+def get_maps_service():
+    """This worker's GoogleMapsServices, created on first use"""
+    global _maps_service
+    if _maps_service is None:
+        from services import GoogleMapsServices
+        _maps_service = GoogleMapsServices(GOOGLE_MAPS_API_KEY)
+    return _maps_service
+
+
+def plan_route(spec):
+    """Run one route spec end to end and return its JSON-serializable result"""
+    started = time.perf_counter()
+    result = {'id': spec['id'], 'start': spec['start'], 'end': spec['end']}
+    try:
+        trip = run_trip_pipeline(
+            get_maps_service(),
+            spec['start'],
+            spec['end'],
+            stop_names=spec['stops'],
+            avoid_highways=spec['avoid_highways'],
+            place_types=spec['place_types'],
+            radius_km=spec['radius_km']
+        )
+        missing = [name for name, point in ((spec['start'], trip['start_coords']), (spec['end'], trip['end_coords'])) if not point]
+        missing += trip['missing_stops']
+        if missing:
+            raise ValueError(f"Could not geocode: {', '.join(missing)}")
+
+        route, places = trip['route'], trip['places']
+        if route is None:
+            raise ValueError("No route found")
+
+        along = distance_along_path_km(route.points, [place['coords'] for place in places]) if places else []
+        ratings = [place['rating'] for place in places if isinstance(place.get('rating'), (int, float))]
+
+        result.update({
+            'distance_miles': route.distance_miles,
+            'duration_hours': route.duration_hours,
+            'num_places': len(places),
+            'warnings': trip['warnings'],
+            'average_rating': round(sum(ratings) / len(ratings), 2) if ratings else None,
+            'polyline': route.encoded_polyline(),
+            'places': [
+                {
+                    'place_id': place.get('place_id'),
+                    'name': place.get('name'),
+                    'place_type': place.get('place_type'),
+                    'rating': place.get('rating'),
+                    'coords': place['coords'],
+                    'route_km': round(float(route_km), 2)
+                }
+                for place, route_km in zip(places, along)
+            ]
+        })
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def run_batch(input_path, output_path, workers=8, executor='thread', retry_failed=False, max_in_flight=None):
+    """Plan every pending route, appending results as they finish; returns the summary dict"""
+    done = completed_ids(output_path, retry_failed)
+    max_in_flight = max_in_flight or workers * 2
+    pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+
+    summary = {'planned': 0, 'failed': 0, 'skipped': 0, 'places': 0}
+    latencies = []
+    ensure_line_boundary(output_path)
+    started = time.perf_counter()
+    with pool_class(max_workers=workers) as pool, open(output_path, 'a', encoding='utf-8') as out:
+        pending = set()
+
+        def drain(return_when):
+            nonlocal pending
+            finished, pending = wait(pending, return_when=return_when)
+            for future in finished:
+                result = future.result()
+                out.write(json.dumps(result, separators=(',', ':')) + "\n")
+                out.flush()
+                latencies.append(result['seconds'])
+                if result.get('error'):
+                    summary['failed'] += 1
+                else:
+                    summary['planned'] += 1
+                    summary['places'] += result['num_places']
+
+        # Only max_in_flight specs are read ahead, so memory stays flat for any input size
+        for spec in read_specs(input_path):
+            if spec['id'] in done:
+                summary['skipped'] += 1
+                continue
+            pending.add(pool.submit(plan_route, spec))
+            if len(pending) >= max_in_flight:
+                drain(FIRST_COMPLETED)
+        while pending:
+            drain(FIRST_COMPLETED)
+
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    finished = summary['planned'] + summary['failed']
+    summary.update({
+        'seconds': round(elapsed, 2),
+        'routes_per_second': round(finished / elapsed, 2) if elapsed > 0 else 0.0,
+        'p50_seconds': latencies[len(latencies) // 2] if latencies else None,
+        'p95_seconds': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None
+    })
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ScenicSync batch route planning")
+    parser.add_argument('input', help="route specs, .csv or .jsonl")
+    parser.add_argument('output', help="results .jsonl, appended to and used as the resume checkpoint")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--executor', choices=('thread', 'process'), default='thread')
+    parser.add_argument('--retry-failed', action='store_true', help="re-plan routes whose earlier result was an error")
+    args = parser.parse_args()
+
+    summary = run_batch(args.input, args.output, args.workers, args.executor, args.retry_failed)
+    print(
+        f"Planned {summary['planned']} routes ({summary['failed']} failed, {summary['skipped']} already done) "
+        f"in {summary['seconds']}s: {summary['routes_per_second']} routes/s, "
+        f"p50 {summary['p50_seconds']}s, p95 {summary['p95_seconds']}s, {summary['places']} places",
+        file=sys.stderr
+    )
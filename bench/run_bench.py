@@ -0,0 +1,179 @@
+"""
+Offline benchmark suite for ScenicSync
+
+Runs the main hot paths against the local Google Maps stub and reports p50/p95
+per scenario. Results are compared with bench/baseline.json and the run fails
+if any scenario is slower than the baseline by more than the tolerance.
+
+Usage:
+    python bench/run_bench.py                   # run and check against the baseline
+    python bench/run_bench.py --update-baseline # record a new baseline
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_PATH = os.path.join(ROOT, 'bench', 'baseline.json')
+ROUTE = ("Boston, MA", "Bar Harbor, ME")
+PLACE_TYPES = ['restaurant', 'tourist_attraction', 'gas_station', 'lodging', 'park']
+SEARCH_RADIUS_KM = 30
+
+
+def configure_environment(base_url):
+    """Point config at the stub and turn off anything that would hide API cost
+
+    Must run before config is imported, since settings are read at import time.
+    """
+    os.environ['GOOGLE_MAPS_BASE_URL'] = base_url
+    os.environ['SCENICSYNC_CACHE_PATH'] = ''
+    os.environ['PLACES_PAGE_TOKEN_DELAY'] = '0'
+    os.environ['SINGLE_FLIGHT_ENABLED'] = 'false'
+    for qps_setting in ('GEOCODE_QPS', 'DIRECTIONS_QPS', 'NEARBY_SEARCH_QPS', 'DETAILS_QPS'):
+        os.environ[qps_setting] = '0'
+    os.environ['QUOTA_DAILY_BUDGET_USD'] = '0'
+    os.environ['QUOTA_MONTHLY_BUDGET_USD'] = '0'
+    # Memoized stages and rendered maps would turn every iteration after the first into cache hits
+    for cache_setting in ('DIRECTIONS_STAGE_MAX_ENTRIES', 'SEARCH_POINTS_STAGE_MAX_ENTRIES',
+                          'PLACES_SEARCH_STAGE_MAX_ENTRIES', 'MAP_HTML_CACHE_MAX_ENTRIES'):
+        os.environ[cache_setting] = '0'
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def measure(func, iterations, warmup=1):
+    """Wall-clock milliseconds for each of iterations calls, after warmup calls"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def build_scenarios(services):
+    """Scenario name -> zero-argument callable, sharing one prepared route"""
+    from polyline import decode_polylines, encode_polyline
+
+    maps_service = services.GoogleMapsServices('stub-key')
+    start_coords = maps_service.geocode_location(ROUTE[0])
+    end_coords = maps_service.geocode_location(ROUTE[1])
+    route = maps_service.get_directions(start_coords, end_coords)
+    places = maps_service.find_places_along_route(start_coords, end_coords, PLACE_TYPES, SEARCH_RADIUS_KM, route=route)
+
+    step_polylines = [encode_polyline(route.points[i:i + 50])
+                      for i in range(0, len(route.points), 50)]
+
+    def end_to_end():
+        start = maps_service.geocode_location(ROUTE[0])
+        end = maps_service.geocode_location(ROUTE[1])
+        new_route = maps_service.get_directions(start, end)
+        found = maps_service.find_places_along_route(start, end, PLACE_TYPES, SEARCH_RADIUS_KM, route=new_route)
+        maps_service.create_route_map(new_route, start, end, [], found).get_root().render()
+
+    return {
+        'end_to_end_route': end_to_end,
+        'places_fanout': lambda: maps_service.find_places_along_route(
+            start_coords, end_coords, PLACE_TYPES, SEARCH_RADIUS_KM, route=route
+        ),
+        'decode_polyline_batch': lambda: decode_polylines(step_polylines),
+        'decode_polyline_reference': lambda: [maps_service.decode_polyline(p) for p in step_polylines],
+        'create_route_map': lambda: maps_service.create_route_map(
+            route, start_coords, end_coords, [], places
+        ).get_root().render()
+    }, len(route.points), len(places)
+
+
+def compare(results, baseline, tolerance):
+    """List of regression messages for scenarios slower than baseline * (1 + tolerance)"""
+    regressions = []
+    for name, stats in results.items():
+        reference = baseline.get('scenarios', {}).get(name)
+        if not reference:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            # A 1 ms floor keeps sub-millisecond scenarios from flapping on timer noise
+            limit = reference[metric] * (1 + tolerance) + 1.0
+            if stats[metric] > limit:
+                regressions.append(f"{name} {metric}: {stats[metric]:.1f} ms > {limit:.1f} ms (baseline {reference[metric]:.1f})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ScenicSync offline benchmarks")
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--latency-ms', type=float, default=30)
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown vs. baseline (0.25 = 25%%)")
+    parser.add_argument('--only', nargs='*', help="run only these scenarios")
+    parser.add_argument('--fixtures', help="have the stub serve these recorded responses where available")
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    from bench.stub_server import StubServer
+
+    stub = StubServer(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate, fixtures_path=args.fixtures
+    ).start()
+    configure_environment(stub.base_url)
+    import services
+
+    scenarios, num_points, num_places = build_scenarios(services)
+    print(f"Route: {ROUTE[0]} -> {ROUTE[1]}, {num_points} polyline points, {num_places} places")
+    print(f"Stub latency {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, error rate {args.error_rate:.0%}\n")
+
+    results = {}
+    for name, func in scenarios.items():
+        if args.only and name not in args.only:
+            continue
+        samples = measure(func, args.iterations)
+        results[name] = {
+            'p50_ms': round(percentile(samples, 0.5), 3),
+            'p95_ms': round(percentile(samples, 0.95), 3),
+            'iterations': len(samples)
+        }
+        print(f"{name:<28} p50 {results[name]['p50_ms']:>10.2f} ms   p95 {results[name]['p95_ms']:>10.2f} ms")
+
+    settings = {'latency_ms': args.latency_ms, 'jitter_ms': args.jitter_ms, 'error_rate': args.error_rate}
+    if args.update_baseline:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump({'settings': settings, 'scenarios': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nBaseline written to {BASELINE_PATH}")
+        return 0
+
+    if not os.path.exists(BASELINE_PATH):
+        print("\nNo baseline yet; run with --update-baseline to record one")
+        return 0
+
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    if baseline.get('settings') != settings:
+        print(f"\nWarning: baseline was recorded with {baseline.get('settings')}, comparison may be misleading")
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions against baseline:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+
+    print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""
+Local Google Maps API stub for offline benchmarks
+
+Serves Geocoding, Directions, Nearby Search and Place Details responses shaped
+like Google's, synthesized deterministically from the request parameters or
+replayed from recorded fixtures, with configurable latency and error injection.
+Point the app at it with GOOGLE_MAPS_BASE_URL=http://127.0.0.1:<port>.
+
+Run standalone with:
+    python bench/stub_server.py --port 8765 --latency-ms 80 --error-rate 0.02
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from polyline import encode_polyline
+
+RESULTS_PER_PAGE = 20
+MAX_PAGES = 3
+POINTS_PER_KM = 10
+POINTS_PER_STEP = 50
+
+
+def _seed(*parts):
+    """Stable integer seed from request parameters"""
+    return int.from_bytes(hashlib.sha1("|".join(map(str, parts)).encode()).digest()[:8], 'big')
+
+
+def _parse_coords(value):
+    lat, lng = value.split(',')
+    return float(lat), float(lng)
+
+
+def _distance_km(a, b):
+    lat1, lng1, lat2, lng2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371.0088 * math.asin(math.sqrt(h))
+
+
+def geocode_response(params):
+    # Imported lazily: gazetteer pulls in config, which must see the benchmark's environment first
+    from gazetteer import get_gazetteer
+
+    address = params.get('address', '')
+    coords = get_gazetteer().lookup(address)
+    if coords is None:
+        rng = random.Random(_seed('geocode', address.lower()))
+        coords = [rng.uniform(30, 47), rng.uniform(-120, -72)]
+    return {
+        'status': 'OK',
+        'results': [{
+            'formatted_address': address,
+            'geometry': {'location': {'lat': coords[0], 'lng': coords[1]}}
+        }]
+    }
+
+
+def directions_response(params):
+    stops = [_parse_coords(params['origin'])]
+    if params.get('waypoints'):
+        stops.extend(_parse_coords(wp) for wp in params['waypoints'].split('|'))
+    stops.append(_parse_coords(params['destination']))
+
+    legs = []
+    for leg_index, (start, end) in enumerate(zip(stops, stops[1:])):
+        km = _distance_km(start, end)
+        # Scenic roads wander: the drive is a wiggly path about 30% longer than the crow flies
+        num_points = max(2, int(km * POINTS_PER_KM))
+        rng = random.Random(_seed('directions', start, end))
+        phase = rng.uniform(0, math.pi)
+        points = []
+        for i in range(num_points):
+            t = i / (num_points - 1)
+            wiggle = 0.02 * math.sin(phase + t * km / 3) * math.sin(math.pi * t)
+            points.append([start[0] + (end[0] - start[0]) * t + wiggle,
+                           start[1] + (end[1] - start[1]) * t - wiggle])
+
+        steps = []
+        for first in range(0, num_points - 1, POINTS_PER_STEP):
+            chunk = points[first:first + POINTS_PER_STEP + 1]
+            steps.append({'polyline': {'points': encode_polyline(chunk)}})
+
+        meters = int(km * 1300)
+        seconds = int(meters / 22)
+        hours, minutes = divmod(seconds // 60, 60)
+        legs.append({
+            'distance': {'text': f"{meters / 1609.344:.1f} mi", 'value': meters},
+            'duration': {'text': f"{hours} hours {minutes} mins" if hours else f"{minutes} mins", 'value': seconds},
+            'start_location': {'lat': start[0], 'lng': start[1]},
+            'end_location': {'lat': end[0], 'lng': end[1]},
+            'steps': steps
+        })
+
+    overview = encode_polyline([stops[0], stops[-1]])
+    return {'status': 'OK', 'routes': [{'legs': legs, 'overview_polyline': {'points': overview}}]}
+
+
+def nearby_response(params):
+    if 'pagetoken' in params:
+        location, place_type, radius, page = params['pagetoken'].split('~')
+        page = int(page)
+    else:
+        location, place_type, radius, page = params['location'], params.get('type', ''), params.get('radius', '50000'), 0
+
+    center = _parse_coords(location)
+    radius_km = float(radius) / 1000
+    rng = random.Random(_seed('nearby', location, place_type, radius, page))
+    results = []
+    for i in range(RESULTS_PER_PAGE):
+        distance = radius_km * math.sqrt(rng.random())
+        bearing = rng.uniform(0, 2 * math.pi)
+        lat = center[0] + distance / 111.195 * math.cos(bearing)
+        lng = center[1] + distance / (111.195 * math.cos(math.radians(center[0]))) * math.sin(bearing)
+        # Quantized ids make overlapping search circles return the same places, like the real API
+        place_id = f"stub-{place_type}-{round(lat, 2)}-{round(lng, 2)}"
+        results.append({
+            'place_id': place_id,
+            'name': f"{place_type.replace('_', ' ').title()} {place_id[-8:]}",
+            'rating': round(rng.uniform(3.0, 5.0), 1),
+            'vicinity': f"{rng.randint(1, 999)} Main St",
+            'geometry': {'location': {'lat': lat, 'lng': lng}}
+        })
+
+    response = {'status': 'OK', 'results': results}
+    if page + 1 < MAX_PAGES:
+        response['next_page_token'] = f"{location}~{place_type}~{radius}~{page + 1}"
+    return response
+
+
+def details_response(params):
+    place_id = params.get('place_id', '')
+    rng = random.Random(_seed('details', place_id))
+    return {
+        'status': 'OK',
+        'result': {
+            'name': place_id,
+            'formatted_address': f"{rng.randint(1, 999)} Main St",
+            'formatted_phone_number': f"(555) {rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+            'website': f"https://example.com/{place_id}",
+            'rating': round(rng.uniform(3.0, 5.0), 1),
+            'reviews': [{'rating': 5, 'text': "Worth the detour."}]
+        }
+    }
+
+
+ROUTES = {
+    '/maps/api/geocode/json': ('geocode', geocode_response),
+    '/maps/api/directions/json': ('directions', directions_response),
+    '/maps/api/place/nearbysearch/json': ('nearby_search', nearby_response),
+    '/maps/api/place/details/json': ('details', details_response)
+}
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded stub with shared latency and error-injection settings"""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=0, fixtures_path=None):
+        super().__init__(('127.0.0.1', port), StubHandler)
+        self.player = None
+        if fixtures_path:
+            # Imported lazily for the same reason as the gazetteer
+            from fixtures import FixturePlayer
+            self.player = FixturePlayer(fixtures_path)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.request_count = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def draw(self):
+        """(delay seconds, injected status or None) for the next request"""
+        with self.rng_lock:
+            self.request_count += 1
+            delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            status = None
+            if self.error_rate and self.rng.random() < self.error_rate:
+                status = self.rng.choice((429, 503))
+            return delay, status
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='maps-stub', daemon=True).start()
+        return self
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        delay, injected_status = self.server.draw()
+        time.sleep(delay)
+
+        endpoint, handler = ROUTES.get(url.path, (None, None))
+        if handler is None:
+            self.send_json(404, {'status': 'NOT_FOUND'})
+        elif injected_status:
+            self.send_json(injected_status, {'status': 'UNKNOWN_ERROR'})
+        else:
+            self.send_json(200, self.recorded_response(endpoint, params) or handler(params))
+
+    def recorded_response(self, endpoint, params):
+        """Recorded body for the request, if the stub was given fixtures that have one"""
+        if self.server.player is None:
+            return None
+        from fixtures import FixtureMiss
+        try:
+            return self.server.player.play(endpoint, params).text
+        except FixtureMiss:
+            return None
+
+    def send_json(self, status, payload):
+        body = (payload if isinstance(payload, str) else json.dumps(payload)).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Google Maps API stub")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fixtures', help="serve responses recorded with HTTP_FIXTURE_MODE=record where available")
+    args = parser.parse_args()
+
+    server = StubServer(args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.seed, args.fixtures)
+    print(f"Google Maps stub listening on {server.base_url}")
+    server.serve_forever()
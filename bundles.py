@@ -0,0 +1,194 @@
+"""
+Precompiled curated-route bundles for ScenicSync
+
+Each curated route's road polyline, leg offsets and totals, plus a snapshot of
+the places along it for every type in CURATED_PLACE_TYPES, are fetched once
+and written to a gzip-compressed JSON artifact. The app loads it lazily, so
+predefined routes open in milliseconds without any API calls.
+
+Build or refresh the bundle (needs GOOGLE_MAPS_API_KEY) with:
+    python bundles.py
+"""
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+from config import *
+from geo import distance_along_path_km
+from place_filters import collapse_duplicate_places, dedupe_places
+from polyline import decode_polylines, encode_polyline
+from route import Route
+
+BUNDLE_VERSION = 1
+SECONDS_PER_DAY = 24 * 3600
+
+
+def stops_signature(waypoints):
+    """Hash of a curated route's stops, so an edited route never loads an old snapshot"""
+    coords = [[round(float(c), 5) for c in waypoint['coords']] for waypoint in waypoints]
+    return hashlib.sha1(json.dumps(coords).encode('utf-8')).hexdigest()
+
+
+def build_bundle(maps_service, scenic_routes, path=None, place_types=CURATED_PLACE_TYPES,
+                 radius_km=CURATED_SEARCH_RADIUS_KM):
+    """Fetch every curated route and its places live and write the bundle; returns the route count"""
+    path = path or CURATED_BUNDLE_PATH
+    routes = {}
+    for name, route_info in scenic_routes.items():
+        waypoints = route_info['waypoints']
+        # One request and no silent fallback: a straight line must never be baked in
+        google_route = maps_service.request_directions([waypoint['coords'] for waypoint in waypoints])
+        route = maps_service.convert_google_route(google_route) if google_route else None
+        if route is None:
+            raise RuntimeError(f"Could not fetch directions for {name}")
+
+        places_by_type = {}
+        for place_type in place_types:
+            places = maps_service.find_places_along_route(
+                waypoints[0]['coords'], waypoints[-1]['coords'], [place_type], radius_km,
+                route=route, max_places=None
+            )
+            # Stored in driving order, so any mix of types merges in one sort
+            if places:
+                along = distance_along_path_km(route.points, [place['coords'] for place in places])
+                for place, route_km in zip(places, along):
+                    place['route_km'] = round(float(route_km), 2)
+                places.sort(key=lambda place: place['route_km'])
+            places_by_type[place_type] = places
+
+        routes[name] = {
+            'stops': stops_signature(waypoints),
+            'distance_meters': route.distance_meters,
+            'duration_seconds': route.duration_seconds,
+            'polyline': encode_polyline(route.points),
+            'leg_offsets': [int(offset) for offset in route.leg_offsets],
+            'places': places_by_type
+        }
+
+    bundle = {
+        'version': BUNDLE_VERSION,
+        'built_at': time.time(),
+        'search_radius_km': radius_km,
+        'routes': routes
+    }
+
+    # Write to a temp file and rename, so a running app never loads a half-written bundle
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        os.chmod(temp_path, 0o644)
+        with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+            f.write(json.dumps(bundle, separators=(',', ':')).encode('utf-8'))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return len(routes)
+
+
+class CuratedBundle:
+    """Loaded curated-route bundle; routes are decoded on first use"""
+
+    def __init__(self, path):
+        with gzip.open(path, 'rb') as f:
+            data = json.loads(f.read().decode('utf-8'))
+        if data.get('version') != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported curated bundle version in {path}")
+
+        self.built_at = data['built_at']
+        self.search_radius_km = data['search_radius_km']
+        self.entries = data['routes']
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def age_days(self):
+        return (time.time() - self.built_at) / SECONDS_PER_DAY
+
+    def is_fresh(self, max_age_days=CURATED_BUNDLE_MAX_AGE_DAYS):
+        return self.age_days() <= max_age_days
+
+    def entry(self, name, waypoints):
+        """The bundled entry for a curated route, or None if missing or built for other stops"""
+        entry = self.entries.get(name)
+        if entry is None or entry['stops'] != stops_signature(waypoints):
+            return None
+        return entry
+
+    def route(self, name, waypoints):
+        """The bundled Route for a curated route, or None"""
+        entry = self.entry(name, waypoints)
+        if entry is None:
+            return None
+
+        with self.lock:
+            route = self.routes.get(name)
+            if route is None:
+                points = decode_polylines(entry['polyline'])
+                route = self.routes[name] = Route(
+                    distance_meters=entry['distance_meters'],
+                    duration_seconds=entry['duration_seconds'],
+                    points=points,
+                    leg_offsets=np.asarray(entry['leg_offsets'])
+                )
+        return route
+
+    def places(self, name, waypoints, place_types, radius_km, max_places=MAX_PLACES_PER_SEARCH):
+        """Bundled places of the given types along a curated route, or None if not all were bundled"""
+        entry = self.entry(name, waypoints)
+        if entry is None or radius_km != self.search_radius_km:
+            return None
+        if any(place_type not in entry['places'] for place_type in place_types):
+            return None
+
+        merged = sorted(
+            itertools.chain.from_iterable(entry['places'][place_type] for place_type in place_types),
+            key=lambda place: place['route_km']
+        )
+        # Copies, so callers can't change the bundled snapshot
+        places = dedupe_places(dict(place) for place in merged)
+        return collapse_duplicate_places(places)[:max_places]
+
+
+_bundle = None
+_bundle_mtime = None
+_bundle_lock = threading.Lock()
+
+
+def get_curated_bundle():
+    """Get the process-wide curated bundle, reloading it if the file changed; None if unavailable"""
+    global _bundle, _bundle_mtime
+    with _bundle_lock:
+        try:
+            mtime = os.path.getmtime(CURATED_BUNDLE_PATH)
+        except OSError:
+            _bundle, _bundle_mtime = None, None
+            return None
+
+        if mtime != _bundle_mtime:
+            try:
+                _bundle = CuratedBundle(CURATED_BUNDLE_PATH)
+            except (OSError, ValueError, KeyError):
+                # A broken bundle just means curated routes are fetched live
+                _bundle = None
+            _bundle_mtime = mtime
+    return _bundle
+
+
+if __name__ == "__main__":
+    from services import GoogleMapsServices
+    from utils import get_scenic_routes
+
+    maps_service = GoogleMapsServices(GOOGLE_MAPS_API_KEY)
+    if not maps_service.api_available:
+        print("GOOGLE_MAPS_API_KEY is required to build the curated route bundle")
+        sys.exit(1)
+
+    count = build_bundle(maps_service, get_scenic_routes())
+    print(f"Wrote {count} curated routes to {CURATED_BUNDLE_PATH}")
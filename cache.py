@@ -0,0 +1,175 @@
+"""
+Disk-backed response caches for ScenicSync
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import *
+from metrics import record_cache_lookup
+
+_local = threading.local()
+
+
+def get_connection(path):
+    """Get this thread's SQLite connection to a ScenicSync database file"""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(path)
+    if conn is None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # WAL lets every Streamlit worker process read while one of them writes
+        conn = sqlite3.connect(path, timeout=CACHE_BUSY_TIMEOUT, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_lru ON cache (namespace, accessed_at)")
+        connections[path] = conn
+    return conn
+
+
+class PersistentCache:
+    """SQLite cache with a TTL and size-bounded LRU eviction, shared across processes"""
+
+    def __init__(self, namespace, ttl_seconds, max_entries, path=None):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.path = path or CACHE_DB_PATH
+        self.enabled = bool(self.path) and max_entries > 0
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired"""
+        if not self.enabled:
+            return None
+
+        try:
+            conn = get_connection(self.path)
+            now = time.time()
+            row = conn.execute(
+                "SELECT value, created_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+
+            if row is None:
+                record_cache_lookup(self.namespace, False)
+                return None
+
+            value, created_at = row
+            if now - created_at > self.ttl_seconds:
+                conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                )
+                record_cache_lookup(self.namespace, False)
+                return None
+
+            conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key)
+            )
+            record_cache_lookup(self.namespace, True)
+            return json.loads(value)
+        except (sqlite3.Error, ValueError):
+            # A broken cache must never break the app - treat it as a miss
+            record_cache_lookup(self.namespace, False)
+            return None
+
+    def set(self, key, value):
+        """Store a JSON-serializable value and evict the least recently used overflow"""
+        if not self.enabled:
+            return
+
+        try:
+            serialized = json.dumps(value)
+            conn = get_connection(self.path)
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, serialized, now, now)
+                )
+                conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                    "SELECT key FROM cache WHERE namespace = ? "
+                    "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.namespace, self.namespace, self.max_entries)
+                )
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        except (sqlite3.Error, TypeError, ValueError):
+            pass
+
+    def clear(self):
+        """Remove every entry in this namespace"""
+        if not self.enabled:
+            return
+
+        try:
+            conn = get_connection(self.path)
+            conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+        except sqlite3.Error:
+            pass
+
+
+class MemoryCache:
+    """Thread-safe in-process LRU cache, for values too large or short-lived for SQLite"""
+
+    def __init__(self, namespace, max_entries, ttl_seconds=None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+        record_cache_lookup(self.namespace, entry is not None)
+        return entry[1] if entry is not None else None
+
+    def set(self, key, value):
+        """Store a value and evict the least recently used overflow"""
+        if self.max_entries <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def normalize_place_name(place_name):
+    """Normalize a place string so trivially different spellings share a cache key"""
+    parts = [" ".join(part.split()) for part in place_name.lower().split(",")]
+    return ", ".join(part for part in parts if part)
@@ -24,18 +24,109 @@ except ImportError:
 except Exception as e:
     print(f"⚠️ Error loading secrets: {e}")
 
-# Google Maps API endpoints
-GOOGLE_GEOCODING_URL = "https://maps.googleapis.com/maps/api/geocode/json"
-GOOGLE_DIRECTIONS_URL = "https://maps.googleapis.com/maps/api/directions/json"
-GOOGLE_PLACES_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-GOOGLE_PLACE_DETAILS_URL = "https://maps.googleapis.com/maps/api/place/details/json"
+# Google Maps API endpoints (the base URL can point at a local stub, see bench/)
+GOOGLE_MAPS_BASE_URL = os.getenv("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com").rstrip("/")
+GOOGLE_GEOCODING_URL = f"{GOOGLE_MAPS_BASE_URL}/maps/api/geocode/json"
+GOOGLE_DIRECTIONS_URL = f"{GOOGLE_MAPS_BASE_URL}/maps/api/directions/json"
+GOOGLE_PLACES_URL = f"{GOOGLE_MAPS_BASE_URL}/maps/api/place/nearbysearch/json"
+GOOGLE_PLACE_DETAILS_URL = f"{GOOGLE_MAPS_BASE_URL}/maps/api/place/details/json"
+
+# Offline Gazetteer Settings
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+GAZETTEER_SOURCE_PATH = os.path.join(DATA_DIR, "us_places.csv")
+GAZETTEER_INDEX_PATH = os.getenv("GAZETTEER_INDEX_PATH", os.path.join(DATA_DIR, "gazetteer.idx"))
+GAZETTEER_FUZZY_CUTOFF = 0.85
+
+# Curated Route Bundle Settings (build with `python bundles.py`)
+CURATED_BUNDLE_PATH = os.getenv("CURATED_BUNDLE_PATH", os.path.join(DATA_DIR, "curated_routes.json.gz"))
+CURATED_BUNDLE_MAX_AGE_DAYS = float(os.getenv("CURATED_BUNDLE_MAX_AGE_DAYS", "30"))  # older bundles go live
+CURATED_PLACE_TYPES = ['restaurant', 'tourist_attraction', 'gas_station', 'lodging']
+CURATED_SEARCH_RADIUS_KM = 30
 
 # App Settings
 APP_TITLE = "ScenicSync"
 APP_SUBTITLE = "Take the long way. On purpose."
 MAP_HEIGHT = int(os.getenv("MAP_HEIGHT", "500"))
+MAP_BULK_MARKER_THRESHOLD = int(os.getenv("MAP_BULK_MARKER_THRESHOLD", "100"))  # cluster places above this
 DEFAULT_ZOOM = int(os.getenv("DEFAULT_ZOOM", "8"))
+LIVE_RESULTS_INTERVAL = 1.0  # seconds between progressive redraws while places stream in
+
+# Route Rendering Settings
+MAP_WIDTH_PX = 800  # typical rendered map width, used to size polyline simplification
+SIMPLIFY_PIXEL_TOLERANCE = 0.5
+SIMPLIFY_ZOOM_HEADROOM = 3  # keep the route accurate this many zoom levels past DEFAULT_ZOOM
 
 # API Settings
 REQUEST_TIMEOUT = 15
-MAX_PLACES_PER_SEARCH = 20 
\ No newline at end of file
+MAX_PLACES_PER_SEARCH = 20
+PLACES_MAX_WORKERS = int(os.getenv("PLACES_MAX_WORKERS", "8"))
+SEARCH_POINT_SPACING = 1.5  # multiples of the search radius between route search points
+MAX_SEARCH_POINTS = int(os.getenv("MAX_SEARCH_POINTS", "25"))
+PLACE_CORRIDOR_KM = float(os.getenv("PLACE_CORRIDOR_KM", "15"))  # max distance from the road
+DUPLICATE_PLACE_DISTANCE_KM = 0.05
+PLACES_MAX_PAGES = int(os.getenv("PLACES_MAX_PAGES", "3"))  # Nearby Search returns at most 3 pages
+PLACES_PAGE_TOKEN_DELAY = float(os.getenv("PLACES_PAGE_TOKEN_DELAY", "2"))
+PLACES_PAGE_TOKEN_RETRIES = 2
+DIRECTIONS_MAX_WAYPOINTS = int(os.getenv("DIRECTIONS_MAX_WAYPOINTS", "25"))  # Directions' limit per request
+DIRECTIONS_MAX_WORKERS = int(os.getenv("DIRECTIONS_MAX_WORKERS", "8"))
+
+# HTTP Transport Settings
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = 0.5
+HTTP_BACKOFF_MAX = 8
+HTTP_CONNECT_TIMEOUT = 3.05
+ASYNC_MAX_CONCURRENCY = int(os.getenv("ASYNC_MAX_CONCURRENCY", "32"))  # in-flight requests on the async client
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+ENDPOINT_TIMEOUTS = {
+    'geocode': 5,
+    'directions': REQUEST_TIMEOUT,
+    'nearby_search': 8,
+    'details': 8
+}
+
+# Record/replay fixtures: "record" captures every API response, "replay" serves them offline
+HTTP_FIXTURE_MODE = os.getenv("HTTP_FIXTURE_MODE", "").lower()
+HTTP_FIXTURE_PATH = os.getenv("HTTP_FIXTURE_PATH", os.path.join("fixtures", "google_maps.jsonl.gz"))
+HTTP_FIXTURE_REPLAY_LATENCY = os.getenv("HTTP_FIXTURE_REPLAY_LATENCY", "false").lower() == "true"
+
+# Per-endpoint request rate limits (requests per second, shared by all threads)
+ENDPOINT_QPS = {
+    'geocode': float(os.getenv("GEOCODE_QPS", "40")),
+    'directions': float(os.getenv("DIRECTIONS_QPS", "40")),
+    'nearby_search': float(os.getenv("NEARBY_SEARCH_QPS", "20")),
+    'details': float(os.getenv("DETAILS_QPS", "20"))
+}
+
+# Spend budgets in USD (0 disables) and list prices per 1,000 requests
+QUOTA_DAILY_BUDGET_USD = float(os.getenv("QUOTA_DAILY_BUDGET_USD", "0"))
+QUOTA_MONTHLY_BUDGET_USD = float(os.getenv("QUOTA_MONTHLY_BUDGET_USD", "0"))
+ENDPOINT_COST_PER_1000 = {
+    'geocode': 5.0,
+    'directions': 5.0,
+    'nearby_search': 32.0,
+    'details': 17.0
+}
+
+# Cache Settings
+CACHE_DB_PATH = os.getenv("SCENICSYNC_CACHE_PATH", ".scenicsync_cache.sqlite3")
+CACHE_BUSY_TIMEOUT = 5
+GEOCODE_CACHE_TTL = int(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv("GEOCODE_CACHE_MAX_ENTRIES", "10000"))
+DETAILS_CACHE_TTL = int(os.getenv("DETAILS_CACHE_TTL", str(24 * 3600)))
+DETAILS_CACHE_MAX_ENTRIES = int(os.getenv("DETAILS_CACHE_MAX_ENTRIES", "5000"))
+DETAILS_PREFETCH_COUNT = int(os.getenv("DETAILS_PREFETCH_COUNT", "0"))  # top-rated places to prefetch; each is a billed call
+DETAILS_PREFETCH_WORKERS = 4
+MAP_HTML_CACHE_MAX_ENTRIES = int(os.getenv("MAP_HTML_CACHE_MAX_ENTRIES", "32"))  # in memory, per process
+
+# Route Stage Memoization (in memory, per process): regenerating a route reruns only changed stages
+# A stage with MAX_ENTRIES of 0 stores nothing, so every run recomputes it
+STAGE_CACHE_TTL = int(os.getenv("STAGE_CACHE_TTL", str(3600)))
+DIRECTIONS_STAGE_MAX_ENTRIES = int(os.getenv("DIRECTIONS_STAGE_MAX_ENTRIES", "64"))
+SEARCH_POINTS_STAGE_MAX_ENTRIES = int(os.getenv("SEARCH_POINTS_STAGE_MAX_ENTRIES", "64"))
+PLACES_SEARCH_STAGE_MAX_ENTRIES = int(os.getenv("PLACES_SEARCH_STAGE_MAX_ENTRIES", "2000"))
+
+# Metrics Settings
+METRICS_FILE = os.getenv("METRICS_FILE", "")  # write Prometheus text here after each route
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # serve Prometheus text on this port
+SHOW_DEBUG_PANEL = os.getenv("SCENICSYNC_DEBUG", "false").lower() == "true"
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+Record/replay fixtures for Google Maps API calls
+
+In record mode every HTTP attempt made through the transport is appended to a
+gzip-compressed JSON-lines store; in replay mode those responses are served
+back from memory, in recorded order, without touching the network.
+
+    HTTP_FIXTURE_MODE=record streamlit run app.py   # capture a session
+    HTTP_FIXTURE_MODE=replay streamlit run app.py   # serve it back offline
+"""
+import atexit
+import gzip
+import json
+import os
+import threading
+import time
+import requests
+from transport import GOOGLE_ENDPOINTS, request_key
+
+# Never written to disk: recorded fixtures must be safe to commit and share
+SECRET_PARAMS = {'key'}
+
+
+class FixtureMiss(requests.ConnectionError):
+    """Raised in replay mode for a request that was never recorded"""
+
+
+def fixture_key(endpoint, params):
+    """Identity of a request in the store, without the API key"""
+    return json.dumps(request_key(endpoint, {
+        name: value for name, value in params.items() if name not in SECRET_PARAMS
+    }))
+
+
+def load_fixtures(path):
+    """{fixture key: [recorded entries in order]} from a fixture file"""
+    fixtures = {}
+    if not os.path.exists(path):
+        return fixtures
+    # Each flush appends a gzip member; gzip reads them back as one stream
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                fixtures.setdefault(fixture_key(entry['endpoint'], entry['params']), []).append(entry)
+    return fixtures
+
+
+class FixtureRecorder:
+    """Buffers request/response pairs and appends them to the store in batches"""
+
+    def __init__(self, path, flush_every=50):
+        self.path = path
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        self.buffer = []
+        atexit.register(self.flush)
+
+    def record(self, endpoint, params, response, seconds):
+        entry = {
+            'endpoint': endpoint,
+            'params': {name: value for name, value in params.items() if name not in SECRET_PARAMS},
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in ('Retry-After',) if name in response.headers},
+            'seconds': round(seconds, 4),
+            'body': response.text
+        }
+        with self.lock:
+            self.buffer.append(json.dumps(entry, separators=(',', ':')))
+            if len(self.buffer) >= self.flush_every:
+                self._write()
+
+    def flush(self):
+        with self.lock:
+            self._write()
+
+    def _write(self):
+        if not self.buffer:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with gzip.open(self.path, 'at', encoding='utf-8') as f:
+            f.write("\n".join(self.buffer) + "\n")
+        self.buffer = []
+
+
+class FixturePlayer:
+    """Serves recorded responses; repeated requests step through their recordings in order"""
+
+    def __init__(self, path, replay_latency=False):
+        self.fixtures = load_fixtures(path)
+        self.replay_latency = replay_latency
+        self.lock = threading.Lock()
+        self.positions = {}
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.fixtures.values())
+
+    def play(self, endpoint, params):
+        """The next recorded response for a request, as a requests.Response"""
+        key = fixture_key(endpoint, params)
+        entries = self.fixtures.get(key)
+        if not entries:
+            public_params = {name: value for name, value in params.items() if name not in SECRET_PARAMS}
+            raise FixtureMiss(f"No recorded {endpoint} response for {public_params}")
+
+        with self.lock:
+            position = self.positions.get(key, 0)
+            # Past the end, keep serving the last recording, which is usually the successful one
+            self.positions[key] = min(position + 1, len(entries) - 1)
+        entry = entries[position]
+
+        if self.replay_latency:
+            time.sleep(entry['seconds'])
+
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.headers.update(entry.get('headers', {}))
+        response.headers['Content-Type'] = 'application/json; charset=UTF-8'
+        response.encoding = 'utf-8'
+        response._content = entry['body'].encode('utf-8')
+        response.url = GOOGLE_ENDPOINTS.get(endpoint, endpoint)
+        return response
+
+    def rewind(self):
+        with self.lock:
+            self.positions.clear()
@@ -0,0 +1,294 @@
+"""
+Offline gazetteer for ScenicSync fallback geocoding
+
+The bundled place list (data/us_places.csv, optionally extended with the US
+Census Gazetteer places file) is compiled into a compact sorted index that is
+memory-mapped, so lookups are binary searches over the file. The index
+records the files it was built from, so an automatic refresh after a source
+changes rebuilds from all of them, not just the bundled list.
+
+Build or rebuild the index with:
+    python gazetteer.py data/us_places.csv [2023_Gaz_place_national.txt ...]
+"""
+import bisect
+import csv
+import difflib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import numpy as np
+from config import *
+
+INDEX_MAGIC = b'SSGZ'
+INDEX_VERSION = 2
+HEADER = struct.Struct('<4sIIII')  # magic, version, entry count, names blob size, sources blob size
+
+STATE_ABBREVIATIONS = {
+    'alabama': 'al', 'alaska': 'ak', 'arizona': 'az', 'arkansas': 'ar', 'california': 'ca',
+    'colorado': 'co', 'connecticut': 'ct', 'delaware': 'de', 'district of columbia': 'dc',
+    'florida': 'fl', 'georgia': 'ga', 'hawaii': 'hi', 'idaho': 'id', 'illinois': 'il',
+    'indiana': 'in', 'iowa': 'ia', 'kansas': 'ks', 'kentucky': 'ky', 'louisiana': 'la',
+    'maine': 'me', 'maryland': 'md', 'massachusetts': 'ma', 'michigan': 'mi', 'minnesota': 'mn',
+    'mississippi': 'ms', 'missouri': 'mo', 'montana': 'mt', 'nebraska': 'ne', 'nevada': 'nv',
+    'new hampshire': 'nh', 'new jersey': 'nj', 'new mexico': 'nm', 'new york': 'ny',
+    'north carolina': 'nc', 'north dakota': 'nd', 'ohio': 'oh', 'oklahoma': 'ok', 'oregon': 'or',
+    'pennsylvania': 'pa', 'rhode island': 'ri', 'south carolina': 'sc', 'south dakota': 'sd',
+    'tennessee': 'tn', 'texas': 'tx', 'utah': 'ut', 'vermont': 'vt', 'virginia': 'va',
+    'washington': 'wa', 'west virginia': 'wv', 'wisconsin': 'wi', 'wyoming': 'wy'
+}
+
+COUNTRY_SUFFIXES = ('usa', 'us', 'united states', 'united states of america')
+
+# Census place names carry their legal/statistical area type as a suffix
+CENSUS_SUFFIXES = (' city and borough', ' consolidated government', ' metropolitan government',
+                   ' unified government', ' municipality', ' borough', ' village', ' city',
+                   ' town', ' cdp')
+
+
+def normalize_query(place_name):
+    """Normalize a place string to gazetteer key form ("Boston, Massachusetts, USA" becomes "boston, ma")"""
+    parts = [" ".join(part.split()) for part in place_name.lower().split(",")]
+    parts = [part for part in parts if part]
+    if len(parts) > 1 and parts[-1] in COUNTRY_SUFFIXES:
+        parts = parts[:-1]
+    if len(parts) > 1:
+        parts[-1] = STATE_ABBREVIATIONS.get(parts[-1], parts[-1])
+    return ", ".join(parts)
+
+
+def read_seed_csv(path):
+    """Yield (key, lat, lng) entries from the bundled name,state,lat,lng,aliases CSV"""
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            lat, lng = float(row['lat']), float(row['lng'])
+            yield normalize_query(f"{row['name']}, {row['state']}"), lat, lng
+            for alias in (row.get('aliases') or '').split('|'):
+                if alias.strip():
+                    yield normalize_query(alias), lat, lng
+
+
+def read_census_gazetteer(path):
+    """Yield (key, lat, lng) entries from a US Census Gazetteer places file"""
+    with open(path, newline='', encoding='latin-1') as f:
+        reader = csv.reader(f, delimiter='\t')
+        columns = [column.strip() for column in next(reader)]
+        name_col, state_col = columns.index('NAME'), columns.index('USPS')
+        lat_col, lng_col = columns.index('INTPTLAT'), columns.index('INTPTLONG')
+
+        for row in reader:
+            name = row[name_col].strip()
+            lowered = name.lower()
+            for suffix in CENSUS_SUFFIXES:
+                if lowered.endswith(suffix):
+                    name = name[:-len(suffix)]
+                    break
+            yield normalize_query(f"{name}, {row[state_col]}"), float(row[lat_col]), float(row[lng_col].strip())
+
+
+def read_sources(sources):
+    """Yield (key, lat, lng) entries from (kind, path) sources, kind being 'seed' or 'census'"""
+    for kind, path in sources:
+        reader = read_seed_csv if kind == 'seed' else read_census_gazetteer
+        yield from reader(path)
+
+
+def build_index(sources, path):
+    """Write the places in (kind, path) sources as a sorted, memory-mappable index; the first entry for a key wins"""
+    sources = [(kind, os.path.abspath(source_path)) for kind, source_path in sources]
+    places = {}
+    for key, lat, lng in read_sources(sources):
+        places.setdefault(key, (lat, lng))
+
+    keys = sorted(places)
+    names = [key.encode('utf-8') for key in keys]
+    offsets = np.zeros(len(names) + 1, dtype='<u4')
+    offsets[1:] = np.cumsum([len(name) for name in names])
+    coords = np.array([places[key] for key in keys], dtype='<f4').reshape(-1, 2)
+    blob = b''.join(names)
+    sources_blob = json.dumps(sources).encode('utf-8')
+    # Pad with JSON whitespace so the coordinate array stays 8-byte aligned
+    sources_blob += b' ' * (-(HEADER.size + len(sources_blob)) % 8)
+
+    # Write to a temp file and rename, so readers never map a half-written index
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        os.chmod(temp_path, 0o644)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(keys), len(blob), len(sources_blob)))
+            f.write(sources_blob)
+            f.write(coords.tobytes())
+            f.write(offsets.tobytes())
+            f.write(blob)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return len(keys)
+
+
+def read_header(buffer, path):
+    """Unpack and check an index header"""
+    if len(buffer) < HEADER.size:
+        raise ValueError(f"Not a gazetteer index: {path}")
+    magic, version, count, names_size, sources_size = HEADER.unpack_from(buffer, 0)
+    if magic != INDEX_MAGIC or version != INDEX_VERSION:
+        raise ValueError(f"Not a gazetteer index: {path}")
+    return magic, version, count, names_size, sources_size
+
+
+def index_sources(path):
+    """The (kind, path) sources an index was built from, or None if it is missing or unreadable"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+            magic, version, count, names_size, sources_size = read_header(header, path)
+            return [tuple(source) for source in json.loads(f.read(sources_size))]
+    except (OSError, ValueError):
+        return None
+
+
+def sources_to_rebuild(index_path):
+    """Sources to (re)build the index from, or None if it is current
+
+    A missing or unreadable index is built from the bundled CSV. One whose
+    sources changed is rebuilt from the same sources, as long as they all
+    still exist; otherwise the existing index is kept rather than shrunk.
+    """
+    sources = index_sources(index_path)
+    if sources is None:
+        return [('seed', GAZETTEER_SOURCE_PATH)]
+    if not all(os.path.exists(source_path) for kind, source_path in sources):
+        return None
+    index_mtime = os.path.getmtime(index_path)
+    if any(os.path.getmtime(source_path) > index_mtime for kind, source_path in sources):
+        return sources
+    return None
+
+
+class _Keys:
+    """Lazy sequence view of the sorted keys, so bisect decodes only what it probes"""
+
+    def __init__(self, buffer, offsets, names_start):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.names_start = names_start
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start = self.names_start + int(self.offsets[i])
+        end = self.names_start + int(self.offsets[i + 1])
+        return self.buffer[start:end].decode('utf-8')
+
+
+class Gazetteer:
+    """Memory-mapped sorted place index with exact, prefix and fuzzy lookup"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, names_size, sources_size = read_header(self.buffer, path)
+        self.sources = [tuple(source) for source in json.loads(self.buffer[HEADER.size:HEADER.size + sources_size])]
+
+        coords_start = HEADER.size + sources_size
+        offsets_start = coords_start + count * 8
+        names_start = offsets_start + (count + 1) * 4
+        self.coords = np.frombuffer(self.buffer, dtype='<f4', count=count * 2, offset=coords_start).reshape(-1, 2)
+        offsets = np.frombuffer(self.buffer, dtype='<u4', count=count + 1, offset=offsets_start)
+        self.keys = _Keys(self.buffer, offsets, names_start)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, place_name):
+        """Exact match on the normalized name, as [lat, lng] or None"""
+        key = normalize_query(place_name)
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.coords_at(i)
+        return None
+
+    def prefix_search(self, prefix, limit=10):
+        """(name, [lat, lng]) pairs whose normalized name starts with prefix"""
+        prefix = normalize_query(prefix)
+        matches = []
+        i = bisect.bisect_left(self.keys, prefix)
+        while i < len(self.keys) and len(matches) < limit:
+            key = self.keys[i]
+            if not key.startswith(prefix):
+                break
+            matches.append((key, self.coords_at(i)))
+            i += 1
+        return matches
+
+    def fuzzy_lookup(self, place_name, cutoff=GAZETTEER_FUZZY_CUTOFF):
+        """Closest name sharing the query's first letters, tolerating typos
+
+        A query with a state only matches places in that state, comparing the
+        names without it, so a typo can't land on a same-named town elsewhere.
+        """
+        key = normalize_query(place_name)
+        if len(key) < 2:
+            return None
+
+        # Only names in the query's two-letter block are scored, keeping this a range scan
+        start = bisect.bisect_left(self.keys, key[:2])
+        end = bisect.bisect_left(self.keys, key[:2] + '\uffff')
+        candidates = {i: self.keys[i] for i in range(start, end)}
+
+        name, separator, state = key.rpartition(', ')
+        if separator:
+            suffix = separator + state
+            candidates = {i: candidate[:-len(suffix)] for i, candidate in candidates.items() if candidate.endswith(suffix)}
+            key = name
+
+        names = list(candidates.values())
+        matches = difflib.get_close_matches(key, names, n=1, cutoff=cutoff)
+        if not matches:
+            return None
+        return self.coords_at(list(candidates)[names.index(matches[0])])
+
+    def coords_at(self, i):
+        lat, lng = self.coords[i]
+        return [round(float(lat), 5), round(float(lng), 5)]
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """Get the process-wide gazetteer, building the index if it is missing or its sources changed"""
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            index_path = GAZETTEER_INDEX_PATH
+            sources = sources_to_rebuild(index_path)
+            if sources is not None:
+                try:
+                    build_index(sources, index_path)
+                except OSError:
+                    # Read-only deployment: build next to the temp files instead
+                    index_path = os.path.join(tempfile.gettempdir(), os.path.basename(GAZETTEER_INDEX_PATH))
+                    if sources_to_rebuild(index_path) is not None:
+                        build_index(sources, index_path)
+            _gazetteer = Gazetteer(index_path)
+    return _gazetteer
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    sources = [('seed', sys.argv[1])] + [('census', census_path) for census_path in sys.argv[2:]]
+    count = build_index(sources, GAZETTEER_INDEX_PATH)
+    print(f"Wrote {count} places to {GAZETTEER_INDEX_PATH}")
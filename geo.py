@@ -0,0 +1,252 @@
+"""
+Geodesic helpers for ScenicSync
+"""
+import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+KM_PER_MILE = 1.609344
+
+
+def haversine_km(points, origin):
+    """Great-circle distance (km) from origin to each of points, or pairwise if origin is (N, 2)"""
+    coords = np.radians(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+    origin = np.radians(np.asarray(origin, dtype=np.float64))
+    lat0, lng0 = origin[..., 0], origin[..., 1]
+    a = (np.sin((coords[:, 0] - lat0) / 2) ** 2 +
+         np.cos(lat0) * np.cos(coords[:, 0]) * np.sin((coords[:, 1] - lng0) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distance_matrix_km(points, others=None):
+    """(N, M) great-circle distances (km) between every pair of points and others (default: points)"""
+    a = np.radians(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+    b = a if others is None else np.radians(np.asarray(others, dtype=np.float64).reshape(-1, 2))
+    lat1, lng1 = a[:, 0, None], a[:, 1, None]
+    lat2, lng2 = b[None, :, 0], b[None, :, 1]
+    h = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def path_lengths_km(points):
+    """Cumulative great-circle distance (km) at each vertex of a lat/lng path"""
+    coords = np.radians(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+    if len(coords) < 2:
+        return np.zeros(len(coords))
+
+    lat, lng = coords[:, 0], coords[:, 1]
+    a = (np.sin(np.diff(lat) / 2) ** 2 +
+         np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lng) / 2) ** 2)
+    segments = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    return np.concatenate(([0.0], np.cumsum(segments)))
+
+
+def resample_path(points, spacing_km, max_points=None):
+    """Evenly spaced points by arc length along a lat/lng path, endpoints included"""
+    coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    lengths = path_lengths_km(coords)
+    total_km = lengths[-1] if len(lengths) else 0.0
+
+    if total_km <= 0:
+        return coords[:1].tolist()
+
+    num_points = math.ceil(total_km / spacing_km) + 1
+    if max_points:
+        num_points = min(num_points, max_points)
+    num_points = max(num_points, 2)
+
+    targets = np.linspace(0.0, total_km, num_points)
+    lats = np.interp(targets, lengths, coords[:, 0])
+    lngs = np.interp(targets, lengths, coords[:, 1])
+    return np.column_stack((lats, lngs)).tolist()
+
+
+def distance_along_path_km(path, points, spacing_km=1.0):
+    """Distance (km) from the start of a path to the spot on it nearest each of points"""
+    samples = resample_path(path, spacing_km)
+    total_km = path_lengths_km(path)[-1] if len(samples) > 1 else 0.0
+    along = np.linspace(0.0, total_km, len(samples))
+    return along[np.argmin(distance_matrix_km(points, samples), axis=1)]
+
+
+def _project(coords):
+    """Equirectangular projection in latitude-degree units, good enough at route scale"""
+    scale = math.cos(math.radians(float(np.mean(coords[:, 0]))))
+    return np.column_stack((coords[:, 1] * scale, coords[:, 0]))
+
+
+def simplification_significance(points, min_tolerance=0.0):
+    """Douglas-Peucker significance of each vertex, in latitude degrees
+
+    A vertex survives simplification at tolerance t exactly when its significance
+    is greater than t, so one array stores every level of detail at once.
+    Recursion stops below min_tolerance; those vertices get significance 0.
+    """
+    coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    significance = np.zeros(len(coords))
+    if len(coords) == 0:
+        return significance
+    significance[0] = significance[-1] = np.inf
+    if len(coords) < 3:
+        return significance
+
+    xy = _project(coords)
+    stack = [(0, len(coords) - 1, np.inf)]
+    while stack:
+        first, last, parent = stack.pop()
+        if last - first < 2:
+            continue
+
+        start, end = xy[first], xy[last]
+        segment = end - start
+        inner = xy[first + 1:last] - start
+        length_sq = segment @ segment
+        if length_sq > 0:
+            # Distance to the segment, clamped to its endpoints
+            t = np.clip(inner @ segment / length_sq, 0.0, 1.0)
+            distances = np.hypot(*(inner - np.outer(t, segment)).T)
+        else:
+            distances = np.hypot(*inner.T)
+
+        split = int(np.argmax(distances))
+        distance = distances[split]
+        if distance <= min_tolerance:
+            continue
+
+        # Clamp to the parent so the significance is monotonic down the recursion
+        distance = min(distance, parent)
+        index = first + 1 + split
+        significance[index] = distance
+        stack.append((first, index, distance))
+        stack.append((index, last, distance))
+
+    return significance
+
+
+def simplify_path(points, tolerance, significance=None):
+    """Douglas-Peucker simplification of a lat/lng path at tolerance (latitude degrees)"""
+    coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if significance is None:
+        significance = simplification_significance(coords, tolerance)
+    return coords[significance > tolerance]
+
+
+def zoom_tolerance(points, zoom, map_width_px, map_height_px, pixel_tolerance):
+    """Simplification tolerance for a path drawn at a zoom level
+
+    The zoom is raised to the level that fits the path's extent into the map,
+    so short routes keep their detail, and the tolerance is pixel_tolerance
+    screen pixels at that zoom.
+    """
+    coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    lat_span = max(float(np.ptp(coords[:, 0])), 1e-6)
+    lng_span = max(float(np.ptp(coords[:, 1])), 1e-6)
+    cos_lat = math.cos(math.radians(float(np.mean(coords[:, 0]))))
+
+    # Web Mercator: a 256px world tile spans 360 degrees of longitude at zoom 0
+    fit_zoom = math.floor(math.log2(min(
+        map_width_px * 360 / (256 * lng_span),
+        map_height_px * 360 * cos_lat / (256 * lat_span)
+    )))
+    render_zoom = max(zoom, fit_zoom)
+    return pixel_tolerance * 360 * cos_lat / (256 * 2 ** render_zoom)
+
+
+class GridIndex:
+    """Uniform lat/lng grid over a point set, for radius queries in O(log n)
+
+    Cells are cell_km tall and at least cell_km wide everywhere in the data's
+    latitude band, so any radius up to cell_km only touches the 3x3 block of
+    cells around the query point. Candidates are then checked by haversine.
+    """
+
+    def __init__(self, points, cell_km):
+        self.coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.cell_km = cell_km
+
+        max_lat = float(np.abs(self.coords[:, 0]).max()) if len(self.coords) else 0.0
+        max_lat = min(max_lat + cell_km / KM_PER_DEGREE, 89.9)
+        self.cell_deg = np.array([
+            cell_km / KM_PER_DEGREE,
+            cell_km / (KM_PER_DEGREE * math.cos(math.radians(max_lat)))
+        ])
+
+        keys = self._cell_keys(np.floor(self.coords / self.cell_deg).astype(np.int64))
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+    def _cell_keys(self, cells):
+        """Pack (row, col) cell numbers into sortable int64 keys"""
+        return (cells[..., 0] << 32) + (cells[..., 1] + (1 << 31))
+
+    def query_many(self, points, radius_km):
+        """All (query index, indexed point index) pairs within radius_km, as two arrays
+
+        Vectorized over the queries: the 3x3 cell ranges of every query are
+        expanded into one flat candidate list and checked in a single pass.
+        """
+        if radius_km > self.cell_km:
+            raise ValueError("Query radius larger than the grid cell size")
+
+        coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        cells = np.floor(coords / self.cell_deg).astype(np.int64)
+        offsets = np.array([(i, j) for i in (-1, 0, 1) for j in (-1, 0, 1)])
+        keys = self._cell_keys(cells[:, None, :] + offsets[None, :, :]).ravel()
+        starts = np.searchsorted(self.sorted_keys, keys, side='left')
+        counts = np.searchsorted(self.sorted_keys, keys, side='right') - starts
+
+        total = int(counts.sum())
+        if total == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty.copy()
+
+        # Position of each candidate inside the sorted order: its range start plus its offset in the range
+        range_ids = np.repeat(np.arange(len(keys)), counts)
+        range_offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        candidates = self.order[starts[range_ids] + range_offsets]
+        queries = range_ids // len(offsets)
+
+        near = haversine_km(self.coords[candidates], coords[queries]) <= radius_km
+        return queries[near], candidates[near]
+
+
+class RouteCorridor:
+    """Index over a lat/lng path for testing which points lie within corridor_km of it"""
+
+    def __init__(self, path, corridor_km):
+        # Sample the path densely enough that nearest-sample distance tracks true path distance
+        spacing_km = corridor_km / 4
+        self.radius_km = corridor_km + spacing_km / 2
+        self.index = GridIndex(resample_path(path, spacing_km), corridor_km + spacing_km)
+
+    def contains(self, points):
+        """Boolean mask of points lying inside the corridor"""
+        coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        mask = np.zeros(len(coords), dtype=bool)
+        queries, _ = self.index.query_many(coords, self.radius_km)
+        mask[queries] = True
+        return mask
+
+
+def collapse_near_duplicates(points, keys, distance_km):
+    """Indices of points to keep, dropping any within distance_km of an earlier kept point with the same key"""
+    coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(coords) == 0:
+        return []
+
+    queries, neighbours = GridIndex(coords, distance_km).query_many(coords, distance_km)
+    earlier = neighbours < queries
+    queries, neighbours = queries[earlier], neighbours[earlier]
+
+    # Only points with an earlier same-key neighbour need the sequential pass
+    earlier_neighbours = {}
+    for i, j in zip(queries.tolist(), neighbours.tolist()):
+        if keys[i] == keys[j]:
+            earlier_neighbours.setdefault(i, []).append(j)
+
+    kept = np.ones(len(coords), dtype=bool)
+    for i in sorted(earlier_neighbours):
+        kept[i] = not any(kept[j] for j in earlier_neighbours[i])
+    return np.flatnonzero(kept).tolist()
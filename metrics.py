@@ -0,0 +1,211 @@
+"""
+In-process performance metrics for ScenicSync, exposed in Prometheus text format
+"""
+import bisect
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import *
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, as in the Prometheus data model"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its bucket, like histogram_quantile()"""
+        if self.count == 0:
+            return None
+
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Thread-safe, process-wide store of counters and latency histograms"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels=None, amount=1):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def counter_value(self, name, **labels):
+        """Sum of a counter across every label set matching labels"""
+        with self.lock:
+            return sum(
+                value for (counter_name, counter_labels), value in self.counters.items()
+                if counter_name == name and labels.items() <= dict(counter_labels).items()
+            )
+
+    def histogram_summary(self, name):
+        """{labels: (count, p50, p95, sum)} for every series of a histogram"""
+        with self.lock:
+            return {
+                labels: (h.count, h.quantile(0.5), h.quantile(0.95), h.total)
+                for (histogram_name, labels), h in self.histograms.items()
+                if histogram_name == name
+            }
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            for name in sorted({key[0] for key in self.counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (counter_name, labels), value in sorted(self.counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+            for name in sorted({key[0] for key in self.histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (histogram_name, labels), h in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if histogram_name != name:
+                        continue
+                    cumulative = 0
+                    for upper, bucket_count in zip(h.buckets + ('+Inf',), h.counts):
+                        cumulative += bucket_count
+                        bucket_labels = labels + (('le', str(upper)),)
+                        lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {h.total}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def timed(stage):
+    """Record the latency of a pipeline stage, counting it as an error if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        registry.inc('scenicsync_stage_errors_total', {'stage': stage})
+        raise
+    finally:
+        registry.observe('scenicsync_stage_seconds', time.perf_counter() - start, {'stage': stage})
+
+
+def record_api_call(endpoint, seconds, status):
+    """Record one HTTP attempt against a Google endpoint"""
+    registry.observe('scenicsync_api_request_seconds', seconds, {'endpoint': endpoint})
+    registry.inc('scenicsync_api_requests_total', {'endpoint': endpoint, 'status': str(status)})
+    if status == 'error' or (isinstance(status, int) and status >= 400):
+        registry.inc('scenicsync_api_errors_total', {'endpoint': endpoint})
+
+
+def record_cache_lookup(cache, hit):
+    """Record a cache hit or miss"""
+    registry.inc('scenicsync_cache_requests_total', {'cache': cache, 'result': 'hit' if hit else 'miss'})
+
+
+def cache_hit_ratios():
+    """{cache name: hit ratio} for every cache that has been used"""
+    with registry.lock:
+        caches = {
+            dict(labels)['cache']
+            for name, labels in registry.counters
+            if name == 'scenicsync_cache_requests_total'
+        }
+    ratios = {}
+    for cache in sorted(caches):
+        hits = registry.counter_value('scenicsync_cache_requests_total', cache=cache, result='hit')
+        total = registry.counter_value('scenicsync_cache_requests_total', cache=cache)
+        ratios[cache] = hits / total if total else 0.0
+    return ratios
+
+
+def write_metrics_file(path=None):
+    """Atomically write the Prometheus text to a file, e.g. for node_exporter's textfile collector"""
+    path = path or METRICS_FILE
+    if not path:
+        return
+    try:
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(registry.render_prometheus())
+        os.replace(temp_path, path)
+    except OSError:
+        # Metrics export is best effort and must not break a page render
+        pass
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = registry.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None):
+    """Serve /metrics on a background thread, once per process"""
+    global _server
+    port = port or METRICS_PORT
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(('0.0.0.0', port), _MetricsHandler)
+            except OSError:
+                # Another Streamlit worker process already owns the port
+                return None
+            threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+    return _server
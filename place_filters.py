@@ -0,0 +1,31 @@
+"""
+Place list cleanup shared by live searches and curated bundles
+"""
+from config import *
+from geo import collapse_near_duplicates
+
+
+def dedupe_places(places):
+    """Remove duplicate place_ids, keeping the first occurrence"""
+    return list(dedupe_places_lazily(places))
+
+
+def dedupe_places_lazily(places):
+    """Yield places with unseen place_ids, keeping the first occurrence"""
+    seen_place_ids = set()
+
+    for place in places:
+        place_id = place.get('place_id')
+        if place_id and place_id not in seen_place_ids:
+            seen_place_ids.add(place_id)
+            yield place
+
+
+def collapse_duplicate_places(places):
+    """Collapse same-name listings at (nearly) the same spot"""
+    if not places:
+        return places
+
+    names = [" ".join(str(place.get('name', '')).lower().split()) for place in places]
+    kept = collapse_near_duplicates([place['coords'] for place in places], names, DUPLICATE_PLACE_DISTANCE_KM)
+    return [places[i] for i in kept]
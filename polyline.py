@@ -0,0 +1,77 @@
+"""
+Vectorized Google encoded-polyline codec for ScenicSync
+"""
+import numpy as np
+
+POLYLINE_PRECISION = 1e5
+# 5 bits per chunk is enough for any 35-bit zigzag value, far beyond +/-180 degrees
+MAX_CHUNKS = 7
+
+
+def decode_polylines(encoded_polylines):
+    """Decode one or more encoded polylines into a single (N, 2) float64 lat/lng array"""
+    if isinstance(encoded_polylines, str):
+        encoded_polylines = [encoded_polylines]
+    encoded_polylines = [p for p in encoded_polylines if p]
+    if not encoded_polylines:
+        return np.empty((0, 2), dtype=np.float64)
+
+    data = np.frombuffer("".join(encoded_polylines).encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    if data.min() < 0 or data.max() > 0x3F:
+        raise ValueError("Invalid character in encoded polyline")
+
+    # Each value is a run of 5-bit chunks; a chunk without the 0x20 flag ends the run
+    is_last = data < 0x20
+    if not is_last[-1]:
+        raise ValueError("Truncated encoded polyline")
+    ends = np.flatnonzero(is_last)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    run_ids = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = 5 * (np.arange(len(data)) - starts[run_ids])
+    if shifts.max() >= 5 * MAX_CHUNKS:
+        raise ValueError("Encoded polyline value too long")
+    values = np.bitwise_or.reduceat((data & 0x1F) << shifts, starts)
+
+    point_counts = [count_points(p) for p in encoded_polylines]
+
+    # Zigzag decode into signed lat/lng deltas
+    deltas = ((values >> 1) ^ -(values & 1)).reshape(-1, 2)
+
+    # Deltas restart from zero at every polyline, so undo each polyline's offset
+    totals = np.cumsum(deltas, axis=0)
+    first_points = np.cumsum([0] + point_counts[:-1])
+    offsets = np.zeros_like(totals[first_points])
+    offsets[1:] = totals[first_points[1:] - 1]
+    totals -= np.repeat(offsets, point_counts, axis=0)
+
+    return np.ascontiguousarray(totals / POLYLINE_PRECISION, dtype=np.float64)
+
+
+def encode_polyline(points):
+    """Encode an (N, 2) lat/lng sequence as a Google encoded polyline string"""
+    coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(coords) == 0:
+        return ""
+
+    scaled = np.rint(coords * POLYLINE_PRECISION).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = (deltas << 1) ^ (deltas >> 63)
+
+    # Lay every value out as MAX_CHUNKS 5-bit chunks and keep only the significant ones
+    shifts = 5 * np.arange(MAX_CHUNKS)
+    chunks = (values[:, None] >> shifts) & 0x1F
+    chunk_counts = np.maximum(1, np.sum((values[:, None] >> shifts) > 0, axis=1))
+    keep = np.arange(MAX_CHUNKS) < chunk_counts[:, None]
+    continued = np.arange(MAX_CHUNKS) < (chunk_counts[:, None] - 1)
+
+    encoded = (chunks | (continued * 0x20)) + 63
+    return encoded[keep].astype(np.uint8).tobytes().decode('ascii')
+
+
+def count_points(encoded_polyline):
+    """Number of points in one encoded polyline (two values per point)"""
+    data = np.frombuffer(encoded_polyline.encode('ascii'), dtype=np.uint8)
+    num_values = int(np.count_nonzero(data < 63 + 0x20))
+    if num_values % 2:
+        raise ValueError("Encoded polyline has an odd number of values")
+    return num_values // 2
@@ -0,0 +1,126 @@
+"""
+Rate limiting and spend accounting for Google Maps API calls
+"""
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from config import *
+from cache import get_connection
+
+
+class QuotaExceeded(Exception):
+    """Raised instead of calling an endpoint whose budget is used up"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing rate calls per second with bursts up to capacity"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def try_acquire(self):
+        """Take a token if one is available and return 0, else return the seconds until one is"""
+        if self.rate <= 0:
+            return 0.0
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class QuotaLedger:
+    """Per-endpoint call counts and spend, shared by every process through SQLite
+
+    Periods are UTC days and months; Google bills on Pacific time, so budgets
+    near the day boundary are approximate.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or CACHE_DB_PATH
+        self.enabled = bool(self.path) and (QUOTA_DAILY_BUDGET_USD > 0 or QUOTA_MONTHLY_BUDGET_USD > 0)
+
+    def connection(self):
+        conn = get_connection(self.path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS api_usage (
+                day TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                calls INTEGER NOT NULL,
+                PRIMARY KEY (day, endpoint)
+            )
+        """)
+        return conn
+
+    def spend(self, conn, period_prefix):
+        """Dollars spent in the days matching period_prefix ("YYYY-MM-DD" or "YYYY-MM")"""
+        spent = 0.0
+        rows = conn.execute(
+            "SELECT endpoint, SUM(calls) FROM api_usage WHERE day LIKE ? GROUP BY endpoint",
+            (period_prefix + '%',)
+        )
+        for endpoint, calls in rows:
+            spent += calls * ENDPOINT_COST_PER_1000.get(endpoint, 0) / 1000
+        return spent
+
+    def charge(self, endpoint):
+        """Record one call to endpoint, or raise QuotaExceeded if it would break a budget"""
+        if not self.enabled:
+            return
+
+        day = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        cost = ENDPOINT_COST_PER_1000.get(endpoint, 0) / 1000
+        try:
+            conn = self.connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if QUOTA_DAILY_BUDGET_USD > 0 and self.spend(conn, day) + cost > QUOTA_DAILY_BUDGET_USD:
+                    raise QuotaExceeded(f"Daily Google Maps budget reached; skipping {endpoint} call")
+                if QUOTA_MONTHLY_BUDGET_USD > 0 and self.spend(conn, day[:7]) + cost > QUOTA_MONTHLY_BUDGET_USD:
+                    raise QuotaExceeded(f"Monthly Google Maps budget reached; skipping {endpoint} call")
+                conn.execute(
+                    "INSERT INTO api_usage (day, endpoint, calls) VALUES (?, ?, 1) "
+                    "ON CONFLICT (day, endpoint) DO UPDATE SET calls = calls + 1",
+                    (day, endpoint)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            # Accounting must not take the app down; fail open
+            pass
+
+    def has_budget(self, endpoint):
+        """Whether one more call to endpoint fits in the budgets"""
+        if not self.enabled:
+            return True
+
+        day = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        cost = ENDPOINT_COST_PER_1000.get(endpoint, 0) / 1000
+        try:
+            conn = self.connection()
+            if QUOTA_DAILY_BUDGET_USD > 0 and self.spend(conn, day) + cost > QUOTA_DAILY_BUDGET_USD:
+                return False
+            if QUOTA_MONTHLY_BUDGET_USD > 0 and self.spend(conn, day[:7]) + cost > QUOTA_MONTHLY_BUDGET_USD:
+                return False
+        except sqlite3.Error:
+            pass
+        return True
@@ -0,0 +1,51 @@
+"""
+Compact route representation for ScenicSync
+"""
+from dataclasses import dataclass
+import numpy as np
+from geo import KM_PER_MILE
+from polyline import encode_polyline
+
+SECONDS_PER_HOUR = 3600
+
+
+@dataclass(slots=True, eq=False)
+class Route:
+    """A route as numeric totals plus one (N, 2) float64 lat/lng array
+
+    leg_offsets[i]:leg_offsets[i + 1] is the slice of points covering leg i.
+    significance holds each point's simplification level of detail, filled in
+    when the route is first drawn. Routes compare by identity; compare their
+    contents with stages.route_points_key.
+    """
+    distance_meters: float
+    duration_seconds: float
+    points: np.ndarray
+    leg_offsets: np.ndarray
+    significance: np.ndarray = None
+
+    @property
+    def distance_miles(self):
+        return round(self.distance_meters / 1000 / KM_PER_MILE, 1)
+
+    @property
+    def duration_hours(self):
+        return round(self.duration_seconds / SECONDS_PER_HOUR, 1)
+
+    @property
+    def num_legs(self):
+        return len(self.leg_offsets) - 1
+
+    def leg_points(self, leg):
+        """The (M, 2) slice of points covering one leg"""
+        return self.points[self.leg_offsets[leg]:self.leg_offsets[leg + 1]]
+
+    def encoded_polyline(self):
+        """The whole route as a Google encoded polyline string"""
+        return encode_polyline(self.points)
+
+    @property
+    def nbytes(self):
+        """Memory held by the route's arrays"""
+        arrays = (self.points, self.leg_offsets, self.significance)
+        return sum(array.nbytes for array in arrays if array is not None)
@@ -2,251 +2,611 @@
 Google Maps API services for ScenicSync
 """
 import streamlit as st
-import requests
-import math
+import hashlib
+import itertools
+import json
+import queue
+import threading
+import time
 import folium
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from folium.plugins import FastMarkerCluster
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from config import *
+from cache import MemoryCache, PersistentCache, normalize_place_name
+from transport import get_transport
+from geo import (
+    KM_PER_MILE, path_lengths_km, resample_path, simplification_significance, simplify_path,
+    zoom_tolerance, RouteCorridor
+)
+from polyline import count_points, decode_polylines
+from place_filters import collapse_duplicate_places, dedupe_places, dedupe_places_lazily
+from route import Route, SECONDS_PER_HOUR
+from gazetteer import get_gazetteer
+from stages import coords_key, route_points_key, directions_stage, places_search_stage, search_points_stage
+from metrics import registry, timed
+
+
+def map_concurrently(func, items, max_workers=PLACES_MAX_WORKERS):
+    """Apply func to every item on a bounded thread pool, keeping input order"""
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    
+    # Worker threads inherit the script context so st.warning still reaches the page
+    ctx = get_script_run_ctx(suppress_warning=True)
+    
+    def attach_ctx():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items)), initializer=attach_ctx) as executor:
+        return list(executor.map(func, items))
+
+
+STREAM_DONE = object()
+
+
+def stream_concurrently(func, items, max_workers=PLACES_MAX_WORKERS):
+    """Run generator func over items on a bounded thread pool
+    
+    Yields (item_index, value) for every value as soon as any worker produces it,
+    then (item_index, STREAM_DONE) once that item's generator is exhausted.
+    """
+    items = list(items)
+    results = queue.Queue()
+    ctx = get_script_run_ctx(suppress_warning=True)
+    
+    def attach_ctx():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+    
+    def drain(index, item):
+        try:
+            for value in func(item):
+                results.put((index, value))
+        finally:
+            results.put((index, STREAM_DONE))
+    
+    if not items:
+        return
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))), initializer=attach_ctx) as executor:
+        futures = [executor.submit(drain, index, item) for index, item in enumerate(items)]
+        remaining = len(items)
+        while remaining:
+            index, value = results.get()
+            if value is STREAM_DONE:
+                remaining -= 1
+            yield index, value
+        
+        # Surface worker errors that escaped func
+        for future in futures:
+            future.result()
+
+
+_prefetch_executor = None
+_prefetch_lock = threading.Lock()
+_prefetch_in_flight = set()
+
+
+def get_prefetch_executor():
+    """Get the process-wide background pool used for details prefetching"""
+    global _prefetch_executor
+    with _prefetch_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(
+                max_workers=DETAILS_PREFETCH_WORKERS,
+                thread_name_prefix='details-prefetch'
+            )
+    return _prefetch_executor
+
+
+# Builds each place marker in the browser; the popup is only assembled when opened,
+# from text nodes so place names can't inject HTML
+PLACE_CLUSTER_CALLBACK = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.setIcon(L.AwesomeMarkers.icon({markerColor: 'orange', icon: 'star', prefix: 'glyphicon'}));
+    marker.bindPopup(function () {
+        var popup = document.createElement('div');
+        [row[2], 'Rating: ' + row[3], row[4]].forEach(function (line, i) {
+            if (i > 0) { popup.appendChild(document.createElement('br')); }
+            popup.appendChild(document.createTextNode(line));
+        });
+        return popup;
+    });
+    return marker;
+}
+"""
+
+# Shared by every session: the same route and places always render the same HTML
+_map_html_cache = MemoryCache('route_map', MAP_HTML_CACHE_MAX_ENTRIES)
+
+
+class GoogleAPIError(Exception):
+    """A Google Maps response with no usable result; the message is meant for the user"""
+
+
+class GoogleAPIKeyError(GoogleAPIError):
+    """Google rejected the API key"""
+
+
+class PlacesSearch:
+    """Pagination state of one memoized Nearby Search, shared by the sync and async clients
+    
+    Callers fetch next_params while it is set, hand each response to
+    handle_response and wait token_delay seconds before the next fetch. A
+    search served from the places_search stage starts with cached_pages and no
+    next_params; one that runs to its last page with real answers is stored.
+    """
+    
+    def __init__(self, maps_service, coords, place_type, radius_meters):
+        self.maps_service = maps_service
+        self.place_type = place_type
+        self.key = maps_service.places_search_key(coords, place_type, radius_meters)
+        self.cached_pages = places_search_stage.get(self.key)
+        self.next_params = None if self.cached_pages is not None else maps_service.nearby_params(coords, place_type, radius_meters)
+        # Recorded responses are already valid, so replay skips the token warm-up
+        self.token_delay = 0 if maps_service.transport.replaying else PLACES_PAGE_TOKEN_DELAY
+        self.token_attempts = 0
+        self.pages = []
+        self.complete = True
+    
+    def cached_page_copies(self):
+        """The memoized pages, copied so callers can't change what later searches get"""
+        return [[dict(place) for place in page] for page in self.cached_pages]
+    
+    def handle_response(self, response):
+        """Take one response: its page of places, or None if the same request should be retried"""
+        if response.status_code != 200:
+            self.next_params = None
+            raise GoogleAPIError(f"Places API error: {response.status_code}")
+        
+        data = response.json()
+        
+        # A fresh next_page_token takes a moment to become valid
+        if 'pagetoken' in self.next_params and data.get('status') == 'INVALID_REQUEST' and self.token_attempts < PLACES_PAGE_TOKEN_RETRIES:
+            self.token_attempts += 1
+            return None
+        
+        page = self.maps_service.places_from_response(data, self.place_type)
+        # Throttled or failed pages are passed on but never memoized
+        self.complete = self.complete and data.get('status', 'OK') in ('OK', 'ZERO_RESULTS')
+        self.pages.append([dict(place) for place in page])
+        
+        next_page_token = data.get('next_page_token')
+        if next_page_token and len(self.pages) < PLACES_MAX_PAGES:
+            self.next_params = {'pagetoken': next_page_token, 'key': self.maps_service.api_key}
+        else:
+            self.next_params = None
+            if self.complete:
+                places_search_stage.set(self.key, self.pages)
+        return page
+
 
 class GoogleMapsServices:
     def __init__(self, api_key):
         self.api_key = api_key
-        self.api_available = api_key and api_key != "YOUR_GOOGLE_MAPS_API_KEY_HERE"
+        self.transport = get_transport()
+        # Replayed fixtures stand in for the API, so no key is needed
+        self.api_available = bool(api_key and api_key != "YOUR_GOOGLE_MAPS_API_KEY_HERE") or self.transport.replaying
+        self.geocode_cache = PersistentCache('geocode', GEOCODE_CACHE_TTL, GEOCODE_CACHE_MAX_ENTRIES)
+        self.details_cache = PersistentCache('details', DETAILS_CACHE_TTL, DETAILS_CACHE_MAX_ENTRIES)
+        self.gazetteer = get_gazetteer()
     
+    def can_call(self, endpoint):
+        """Whether a live call to endpoint is possible: API key set and budget left"""
+        return self.api_available and self.transport.has_budget(endpoint)
+    
+    @timed('geocode')
     def geocode_location(self, place_name):
         """Convert place name to coordinates using Google Geocoding API"""
-        if not self.api_available:
+        cache_key = normalize_place_name(place_name)
+        cached_coords = self.geocode_cache.get(cache_key)
+        if cached_coords:
+            return cached_coords
+        
+        if not self.can_call('geocode'):
             return self.geocode_location_fallback(place_name)
         
         try:
-            params = {
-                'address': place_name,
-                'key': self.api_key,
-                'region': 'us'
-            }
-            
-            response = requests.get(GOOGLE_GEOCODING_URL, params=params, timeout=REQUEST_TIMEOUT)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data['results']:
-                    location = data['results'][0]['geometry']['location']
-                    return [location['lat'], location['lng']]
-                else:
-                    st.warning(f"No results found for '{place_name}'")
-            elif response.status_code == 403:
-                st.error("Google Maps API key issue. Using fallback.")
-                return self.geocode_location_fallback(place_name)
-            else:
-                st.warning(f"API error: {response.status_code}")
-                
+            response = self.transport.get('geocode', self.geocode_params(place_name))
+            return self.geocode_from_response(place_name, response)
+        except GoogleAPIKeyError as e:
+            st.error(str(e))
+        except GoogleAPIError as e:
+            st.warning(str(e))
         except Exception as e:
             st.warning(f"Geocoding error: {str(e)}")
         
         return self.geocode_location_fallback(place_name)
     
-    def geocode_location_fallback(self, place_name):
-        """Fallback geocoding using built-in database"""
-        place_lower = place_name.lower().strip()
-        known_locations = self.get_known_locations()
+    def geocode_from_response(self, place_name, response):
+        """Coordinates from a Geocoding response, cached; raises GoogleAPIError if it has none"""
+        if response.status_code == 403:
+            raise GoogleAPIKeyError("Google Maps API key issue. Using fallback.")
+        if response.status_code != 200:
+            raise GoogleAPIError(f"API error: {response.status_code}")
         
-        if place_lower in known_locations:
-            return known_locations[place_lower]
+        data = response.json()
+        if not data['results']:
+            raise GoogleAPIError(f"No results found for '{place_name}'")
         
-        return None
+        location = data['results'][0]['geometry']['location']
+        coords = [location['lat'], location['lng']]
+        self.geocode_cache.set(normalize_place_name(place_name), coords)
+        return coords
     
-    def get_known_locations(self):
-        """Database of common locations"""
+    def geocode_params(self, place_name):
+        """Geocoding API query for one place name"""
         return {
-            "new york, ny": [40.7128, -74.0060],
-            "new york city": [40.7128, -74.0060],
-            "nyc": [40.7128, -74.0060],
-            "boston, ma": [42.3601, -71.0589],
-            "boston": [42.3601, -71.0589],
-            "los angeles, ca": [34.0522, -118.2437],
-            "chicago, il": [41.8781, -87.6298],
-            "houston, tx": [29.7604, -95.3698],
-            "philadelphia, pa": [39.9526, -75.1652],
-            "san diego, ca": [32.7157, -117.1611],
-            "san francisco, ca": [37.7749, -122.4194],
-            "seattle, wa": [47.6062, -122.3321],
-            "denver, co": [39.7392, -104.9903],
-            "washington, dc": [38.9072, -77.0369],
-            "miami, fl": [25.7617, -80.1918],
-            "las vegas, nv": [36.1699, -115.1398],
-            "atlanta, ga": [33.7490, -84.3880],
-            "portland, or": [45.5152, -122.6784],
-            "nashville, tn": [36.1627, -86.7816],
-            "austin, tx": [30.2672, -97.7431],
-            "bar harbor, me": [44.3876, -68.2039],
-            "portsmouth, nh": [43.0717, -70.7625],
-            "kennebunkport, me": [43.3615, -70.4767],
-            "camden, me": [44.2098, -69.0648]
+            'address': place_name,
+            'key': self.api_key,
+            'region': 'us'
         }
     
+    def geocode_location_fallback(self, place_name):
+        """Fallback geocoding using the offline gazetteer"""
+        coords = self.gazetteer.lookup(place_name)
+        if coords is None:
+            coords = self.gazetteer.fuzzy_lookup(place_name)
+        return coords
+    
+    @timed('directions')
     def get_directions(self, start_coords, end_coords, waypoints=None, avoid_highways=True):
-        """Get directions using Google Directions API"""
-        if not self.api_available:
+        """Get directions using Google Directions API, splitting long waypoint lists into parallel requests"""
+        key = self.directions_key(start_coords, end_coords, waypoints, avoid_highways)
+        route = directions_stage.get(key)
+        if route is not None:
+            return route
+        
+        if not self.can_call('directions'):
             return self.create_simple_route(start_coords, end_coords, waypoints)
         
+        google_routes = map_concurrently(
+            lambda chunk: self.request_directions(chunk, avoid_highways),
+            self.directions_chunks(start_coords, end_coords, waypoints),
+            max_workers=DIRECTIONS_MAX_WORKERS
+        )
+        if all(google_routes):
+            # Only real road routes are memoized, never the straight-line fallback
+            route = self.convert_google_routes(google_routes)
+            if route is not None:
+                directions_stage.set(key, route)
+            return route
+        
+        return self.create_simple_route(start_coords, end_coords, waypoints)
+    
+    def directions_key(self, start_coords, end_coords, waypoints=None, avoid_highways=True):
+        """Directions stage key for a trip"""
+        stops = [start_coords] + list(waypoints or []) + [end_coords]
+        return directions_stage.key(coords_key(stops), bool(avoid_highways))
+    
+    def directions_chunks(self, start_coords, end_coords, waypoints=None):
+        """Split a trip's stops into lists small enough for one Directions request each"""
+        # Each request takes at most DIRECTIONS_MAX_WAYPOINTS stops between its ends;
+        # consecutive chunks share a boundary stop so their legs join up
+        stops = [start_coords] + list(waypoints or []) + [end_coords]
+        legs_per_chunk = DIRECTIONS_MAX_WAYPOINTS + 1
+        return [stops[i:i + legs_per_chunk + 1] for i in range(0, len(stops) - 1, legs_per_chunk)]
+    
+    def directions_params(self, stops, avoid_highways=True):
+        """Directions API query for a route through stops (origin, waypoints..., destination)"""
+        params = {
+            'origin': f"{stops[0][0]},{stops[0][1]}",
+            'destination': f"{stops[-1][0]},{stops[-1][1]}",
+            'key': self.api_key,
+            'units': 'imperial'
+        }
+        
+        if len(stops) > 2:
+            waypoint_str = "|".join([f"{wp[0]},{wp[1]}" for wp in stops[1:-1]])
+            params['waypoints'] = waypoint_str
+        
+        if avoid_highways:
+            params['avoid'] = 'highways'
+        return params
+    
+    def request_directions(self, stops, avoid_highways=True):
+        """Fetch the first Google route through stops (origin, waypoints..., destination), or None"""
         try:
-            params = {
-                'origin': f"{start_coords[0]},{start_coords[1]}",
-                'destination': f"{end_coords[0]},{end_coords[1]}",
-                'key': self.api_key,
-                'units': 'imperial'
-            }
-            
-            if waypoints:
-                waypoint_str = "|".join([f"{wp[0]},{wp[1]}" for wp in waypoints])
-                params['waypoints'] = waypoint_str
-            
-            if avoid_highways:
-                params['avoid'] = 'highways'
-            
-            response = requests.get(GOOGLE_DIRECTIONS_URL, params=params, timeout=REQUEST_TIMEOUT)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data['routes']:
-                    return self.convert_google_route(data['routes'][0])
-                else:
-                    st.warning("No routes found")
-            else:
-                st.warning(f"Directions API error: {response.status_code}")
-                
+            response = self.transport.get('directions', self.directions_params(stops, avoid_highways))
+            return self.directions_from_response(response)
+        except GoogleAPIError as e:
+            st.warning(str(e))
         except Exception as e:
             st.warning(f"Directions error: {str(e)}")
         
-        return self.create_simple_route(start_coords, end_coords, waypoints)
+        return None
+    
+    def directions_from_response(self, response):
+        """The first route in a Directions response; raises GoogleAPIError if there is none"""
+        if response.status_code != 200:
+            raise GoogleAPIError(f"Directions API error: {response.status_code}")
+        
+        data = response.json()
+        if not data['routes']:
+            raise GoogleAPIError("No routes found")
+        return data['routes'][0]
     
-    def find_places_along_route(self, start_coords, end_coords, place_types, radius_km=50):
+    def find_places_along_route(self, start_coords, end_coords, place_types, radius_km=50, route=None,
+                                max_places=MAX_PLACES_PER_SEARCH):
         """Find places along a route using multiple search points"""
+        places = []
+        for places, searches_done, total_searches in self.stream_places_along_route(
+            start_coords, end_coords, place_types, radius_km, route, max_places
+        ):
+            pass
+        return places
+    
+    def stream_places_along_route(self, start_coords, end_coords, place_types, radius_km=50, route=None,
+                                  max_places=MAX_PLACES_PER_SEARCH):
+        """Yield (places, searches_done, total_searches) as Places result pages arrive
+        
+        Intermediate snapshots are for progressive display; the last one is the
+        final deduped and filtered list, independent of arrival order, holding at
+        most max_places places (None for all of them).
+        """
         if not self.api_available:
-            return []
+            yield [], 0, 0
+            return
         
-        places = []
-        search_points = self.generate_route_search_points(start_coords, end_coords)
-        
-        for point in search_points:
-            for place_type in place_types:
-                try:
-                    radius_meters = radius_km * 1000
-                    nearby_places = self.search_places_near_point(point, place_type, radius_meters)
-                    places.extend(nearby_places)
-                except Exception as e:
-                    st.warning(f"Error searching for {place_type}: {str(e)}")
-        
-        # Remove duplicates and limit results
-        unique_places = []
-        seen_place_ids = set()
-        
-        for place in places:
-            place_id = place.get('place_id')
-            if place_id and place_id not in seen_place_ids:
-                unique_places.append(place)
-                seen_place_ids.add(place_id)
+        polyline_points = route.points if route else None
+        path = polyline_points if polyline_points is not None and len(polyline_points) >= 2 else [start_coords, end_coords]
+        search_points = self.route_search_points(path, radius_km)
+        radius_meters = radius_km * 1000
+        searches = [(point, place_type) for point in search_points for place_type in place_types]
+        if not self.transport.has_budget('nearby_search'):
+            memoized = self.memoized_searches(searches, radius_meters)
+            if len(memoized) < len(searches):
+                st.warning("Google Maps budget reached - only showing places from earlier searches")
+            searches = memoized
+        corridor = RouteCorridor(path, min(radius_km, PLACE_CORRIDOR_KM))
+        
+        def run_search(search):
+            point, place_type = search
+            try:
+                yield from self.iter_places_near_point(point, place_type, radius_meters)
+            except Exception as e:
+                st.warning(f"Error searching for {place_type}: {str(e)}")
         
-        return unique_places[:MAX_PLACES_PER_SEARCH]
+        # Only time spent here counts towards the stage, not the consumer's rendering between yields
+        started = time.perf_counter()
+        paused = 0.0
+        
+        # Pages are keyed by (search, page) so snapshots read in search order, not arrival order
+        pages = {}
+        page_counts = {}
+        searches_done = 0
+        for search_index, page in stream_concurrently(run_search, searches):
+            if page is STREAM_DONE:
+                searches_done += 1
+            else:
+                page_index = page_counts.get(search_index, 0)
+                page_counts[search_index] = page_index + 1
+                near_route = corridor.contains([place['coords'] for place in page])
+                pages[(search_index, page_index)] = [place for place, keep in zip(page, near_route) if keep]
+            
+            if searches_done < len(searches):
+                # Display only needs the first few unique places, not a full dedupe of every page
+                unique_places = dedupe_places_lazily(place for key in sorted(pages) for place in pages[key])
+                snapshot = list(itertools.islice(unique_places, MAX_PLACES_PER_SEARCH))
+                pause_start = time.perf_counter()
+                yield snapshot, searches_done, len(searches)
+                paused += time.perf_counter() - pause_start
+        
+        places = dedupe_places(place for key in sorted(pages) for place in pages[key])
+        places = collapse_duplicate_places(places)[:max_places]
+        registry.observe('scenicsync_stage_seconds', time.perf_counter() - started - paused, {'stage': 'places_search'})
+        yield places, searches_done, len(searches)
+    
+    def route_search_points(self, path, radius_km):
+        """Search points along a path, memoized on its points and the radius"""
+        key = search_points_stage.key(route_points_key(path), radius_km)
+        return search_points_stage.run(
+            key,
+            lambda: self.generate_route_search_points(path[0], path[-1], polyline_points=path, radius_km=radius_km)
+        )
     
-    def generate_route_search_points(self, start_coords, end_coords, num_points=5):
+    def generate_route_search_points(self, start_coords, end_coords, num_points=5, polyline_points=None, radius_km=None):
         """Generate search points along a route"""
-        points = []
-        for i in range(num_points):
-            lat = start_coords[0] + (end_coords[0] - start_coords[0]) * i / (num_points - 1)
-            lng = start_coords[1] + (end_coords[1] - start_coords[1]) * i / (num_points - 1)
-            points.append([lat, lng])
-        return points
+        if radius_km:
+            # Follow the actual road, spacing searches by the radius so coverage scales with length
+            path = polyline_points if polyline_points is not None and len(polyline_points) >= 2 else [start_coords, end_coords]
+            return resample_path(path, radius_km * SEARCH_POINT_SPACING, MAX_SEARCH_POINTS)
+        
+        start, end = np.asarray(start_coords, dtype=np.float64), np.asarray(end_coords, dtype=np.float64)
+        fractions = np.linspace(0, 1, num_points)[:, None]
+        return (start + (end - start) * fractions).tolist()
     
     def search_places_near_point(self, coords, place_type, radius_meters):
         """Search for places near a specific point"""
+        places = []
+        for page in self.iter_places_near_point(coords, place_type, radius_meters):
+            places.extend(page)
+        return places
+    
+    def iter_places_near_point(self, coords, place_type, radius_meters):
+        """Yield pages of places near a point, following next_page_token
+        
+        A search that completes cleanly is memoized, so asking again replays its pages.
+        """
+        search = PlacesSearch(self, coords, place_type, radius_meters)
+        if search.cached_pages is not None:
+            yield from search.cached_page_copies()
+            return
+        
         try:
-            params = {
-                'location': f"{coords[0]},{coords[1]}",
-                'radius': radius_meters,
-                'type': place_type,
-                'key': self.api_key
-            }
-            
-            response = requests.get(GOOGLE_PLACES_URL, params=params, timeout=REQUEST_TIMEOUT)
-            
-            if response.status_code == 200:
-                data = response.json()
-                places = []
-                
-                for place in data.get('results', []):
-                    place_info = {
-                        'place_id': place.get('place_id'),
-                        'name': place.get('name'),
-                        'rating': place.get('rating', 'N/A'),
-                        'address': place.get('vicinity', 'Address not available'),
-                        'coords': [
-                            place['geometry']['location']['lat'],
-                            place['geometry']['location']['lng']
-                        ],
-                        'place_type': place_type
-                    }
-                    places.append(place_info)
-                
-                return places
-            else:
-                st.warning(f"Places API error: {response.status_code}")
-                
+            while search.next_params is not None:
+                page = search.handle_response(self.transport.get('nearby_search', search.next_params))
+                if page is not None:
+                    yield page
+                if search.next_params is not None:
+                    time.sleep(search.token_delay)
+        except GoogleAPIError as e:
+            st.warning(str(e))
         except Exception as e:
             st.warning(f"Places search error: {str(e)}")
-        
-        return []
+    
+    def memoized_searches(self, searches, radius_meters):
+        """The (point, place_type) searches the places_search stage can answer without a live call"""
+        return [
+            (point, place_type) for point, place_type in searches
+            if places_search_stage.get(self.places_search_key(point, place_type, radius_meters)) is not None
+        ]
+    
+    def places_search_key(self, coords, place_type, radius_meters):
+        """Places search stage key for one (point, type, radius) search"""
+        return places_search_stage.key(coords_key(coords), place_type, float(radius_meters))
+    
+    def nearby_params(self, coords, place_type, radius_meters):
+        """Nearby Search query for the first page of places around a point"""
+        return {
+            'location': f"{coords[0]},{coords[1]}",
+            'radius': radius_meters,
+            'type': place_type,
+            'key': self.api_key
+        }
+    
+    def places_from_response(self, data, place_type):
+        """Convert one page of Nearby Search results to our place format"""
+        places = []
+        for place in data.get('results', []):
+            place_info = {
+                'place_id': place.get('place_id'),
+                'name': place.get('name'),
+                'rating': place.get('rating', 'N/A'),
+                'address': place.get('vicinity', 'Address not available'),
+                'coords': [
+                    place['geometry']['location']['lat'],
+                    place['geometry']['location']['lng']
+                ],
+                'place_type': place_type
+            }
+            places.append(place_info)
+        return places
     
     def get_place_details(self, place_id):
         """Get detailed information about a specific place"""
         if not self.api_available:
             return None
         
+        cached_details = self.details_cache.get(place_id)
+        if cached_details is not None:
+            return cached_details
+        
+        if not self.transport.has_budget('details'):
+            st.warning("Google Maps budget reached - place details unavailable")
+            return None
+        
         try:
-            params = {
-                'place_id': place_id,
-                'key': self.api_key,
-                'fields': 'name,formatted_address,formatted_phone_number,website,opening_hours,rating,reviews'
-            }
-            
-            response = requests.get(GOOGLE_PLACE_DETAILS_URL, params=params, timeout=REQUEST_TIMEOUT)
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('result', {})
-            else:
-                st.warning(f"Place details API error: {response.status_code}")
-                
+            return self.details_from_response(place_id, self.request_place_details(place_id))
+        except GoogleAPIError as e:
+            st.warning(str(e))
         except Exception as e:
             st.warning(f"Place details error: {str(e)}")
         
         return None
     
+    def details_from_response(self, place_id, response):
+        """Place details from a Details response, cached; raises GoogleAPIError on an API error"""
+        if response.status_code != 200:
+            raise GoogleAPIError(f"Place details API error: {response.status_code}")
+        
+        data = response.json()
+        # Throttled, denied or unknown-place replies are still HTTP 200; caching them would stick for a day
+        if data.get('status') != 'OK':
+            raise GoogleAPIError(f"Place details API error: {data.get('status')}")
+        
+        details = data.get('result', {})
+        self.details_cache.set(place_id, details)
+        return details
+    
+    def request_place_details(self, place_id):
+        """Call the Place Details API for one place"""
+        return self.transport.get('details', self.place_details_params(place_id))
+    
+    def place_details_params(self, place_id):
+        """Place Details API query for one place"""
+        return {
+            'place_id': place_id,
+            'key': self.api_key,
+            'fields': 'name,formatted_address,formatted_phone_number,website,opening_hours,rating,reviews'
+        }
+    
+    def prefetch_place_details(self, places, top_n=DETAILS_PREFETCH_COUNT):
+        """Warm the details cache for the top-rated places in the background"""
+        if not self.can_call('details') or top_n <= 0:
+            return
+        
+        rated_places = [place for place in places if isinstance(place.get('rating'), (int, float))]
+        rated_places.sort(key=lambda place: place['rating'], reverse=True)
+        
+        for place in rated_places[:top_n]:
+            place_id = place.get('place_id')
+            if not place_id or self.details_cache.get(place_id) is not None:
+                continue
+            
+            with _prefetch_lock:
+                if place_id in _prefetch_in_flight:
+                    continue
+                _prefetch_in_flight.add(place_id)
+            
+            get_prefetch_executor().submit(self.prefetch_one_place, place_id)
+    
+    def prefetch_one_place(self, place_id):
+        """Fetch and cache details for one place without touching the UI"""
+        try:
+            self.details_from_response(place_id, self.request_place_details(place_id))
+        except Exception:
+            # Prefetching is best effort; a click will retry and report errors
+            pass
+        finally:
+            with _prefetch_lock:
+                _prefetch_in_flight.discard(place_id)
+    
+    def convert_google_routes(self, google_routes):
+        """Convert the consecutive Google routes of a chunked trip into one Route"""
+        if len(google_routes) == 1:
+            return self.convert_google_route(google_routes[0])
+        return self.convert_google_route({'legs': [leg for google_route in google_routes for leg in google_route['legs']]})
+    
     def convert_google_route(self, google_route):
-        """Convert Google Directions API response to our route format"""
+        """Convert Google Directions API response to a Route"""
         try:
             legs = google_route['legs']
-            total_distance = sum(float(leg['distance']['text'].split()[0]) for leg in legs)
-            total_duration = sum(float(leg['duration']['text'].split()[0]) for leg in legs)
+            # The numeric value fields, not the display text ("1 hour 5 mins", "1,203 mi")
+            total_distance = sum(leg['distance']['value'] for leg in legs)
+            total_duration = sum(leg['duration']['value'] for leg in legs)
             
-            # Extract polyline points
-            polyline_points = []
-            for leg in legs:
-                for step in leg['steps']:
-                    if 'polyline' in step:
-                        points = self.decode_polyline(step['polyline']['points'])
-                        polyline_points.extend(points)
+            # Decode every step polyline in one batch into an (N, 2) array
+            leg_polylines = [
+                [step['polyline']['points'] for step in leg['steps'] if 'polyline' in step]
+                for leg in legs
+            ]
+            step_polylines = [polyline for steps in leg_polylines for polyline in steps if polyline]
+            with timed('polyline_decode'):
+                if step_polylines:
+                    polyline_points = decode_polylines(step_polylines)
+                    leg_counts = [sum(count_points(p) for p in steps if p) for steps in leg_polylines]
+                else:
+                    polyline_points = decode_polylines(google_route.get('overview_polyline', {}).get('points', ''))
+                    leg_counts = [len(polyline_points)]
             
-            return {
-                'distance': total_distance,
-                'duration': total_duration,
-                'polyline_points': polyline_points
-            }
+            return Route(
+                distance_meters=total_distance,
+                duration_seconds=total_duration,
+                points=polyline_points,
+                leg_offsets=np.cumsum([0] + leg_counts)
+            )
         except Exception as e:
             st.warning(f"Route conversion error: {str(e)}")
             return None
     
     def decode_polyline(self, polyline_str):
-        """Decode Google polyline string to coordinates"""
+        """Decode Google polyline string to coordinates (reference for polyline.decode_polylines)"""
         try:
             points = []
             index = 0
@@ -286,45 +646,90 @@ class GoogleMapsServices:
             return []
     
     def create_simple_route(self, start_coords, end_coords, waypoints=None):
-        """Create a simple straight-line route when API is not available"""
+        """Create a straight-line route through the stops when API is not available"""
         try:
-            # Calculate distance using Haversine formula
-            lat1, lng1 = start_coords
-            lat2, lng2 = end_coords
-            
-            R = 3959  # Earth's radius in miles
-            
-            lat1_rad = math.radians(lat1)
-            lat2_rad = math.radians(lat2)
-            delta_lat = math.radians(lat2 - lat1)
-            delta_lng = math.radians(lng2 - lng1)
-            
-            a = (math.sin(delta_lat / 2) ** 2 + 
-                 math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng / 2) ** 2)
-            c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-            distance = R * c
+            stops = np.array([start_coords] + list(waypoints or []) + [end_coords], dtype=np.float64)
+            distance_km = path_lengths_km(stops)[-1]
             
             # Estimate duration (assuming 60 mph average)
-            duration = distance / 60
+            duration_hours = distance_km / KM_PER_MILE / 60
             
-            # Create simple polyline
-            polyline_points = [start_coords, end_coords]
-            
-            return {
-                'distance': round(distance, 1),
-                'duration': round(duration, 1),
-                'polyline_points': polyline_points
-            }
+            # Like Google's legs, each leg holds both of its end stops, so interior stops appear twice
+            repeats = np.full(len(stops), 2)
+            repeats[[0, -1]] = 1
+            return Route(
+                distance_meters=float(distance_km * 1000),
+                duration_seconds=float(duration_hours * SECONDS_PER_HOUR),
+                points=np.repeat(stops, repeats, axis=0),
+                leg_offsets=np.arange(0, 2 * len(stops) - 1, 2)
+            )
         except Exception as e:
             st.warning(f"Simple route creation error: {str(e)}")
             return None
     
     def get_route_stats(self, route):
-        """Get distance and duration from route"""
-        if route:
-            return route.get('distance', 0), route.get('duration', 0)
-        return 0, 0
+        """Get distance (miles) and duration (hours) from route"""
+        if route is None:
+            return 0, 0
+        return route.distance_miles, route.duration_hours
+    
+    def simplify_route_points(self, route):
+        """Drop polyline points that are invisible at the zoom levels the map is viewed at"""
+        points = route.points
+        tolerance = zoom_tolerance(
+            points,
+            DEFAULT_ZOOM + SIMPLIFY_ZOOM_HEADROOM,
+            MAP_WIDTH_PX,
+            MAP_HEIGHT,
+            SIMPLIFY_PIXEL_TOLERANCE
+        )
+        if route.significance is None:
+            # Computed on first render and only down to the drawn detail, keeping it off the directions path
+            route.significance = simplification_significance(points, tolerance)
+        return simplify_path(points, tolerance, route.significance).tolist()
+    
+    def add_place_cluster(self, route_map, places):
+        """Draw places as one client-side clustered layer instead of a Marker object each"""
+        data = [
+            [float(place['coords'][0]), float(place['coords'][1]),
+             str(place.get('name', '')), str(place.get('rating', 'N/A')), str(place.get('address', ''))]
+            for place in places
+        ]
+        FastMarkerCluster(data, callback=PLACE_CLUSTER_CALLBACK, name='Discovered places').add_to(route_map)
+    
+    def route_map_key(self, route, start_coords, end_coords, waypoints=None, places=None):
+        """Content hash of everything drawn on the route map"""
+        digest = hashlib.sha1()
+        if route is not None:
+            digest.update(np.ascontiguousarray(route.points, dtype=np.float64).tobytes())
+        markers = {
+            'start': [float(c) for c in start_coords],
+            'end': [float(c) for c in end_coords],
+            'waypoints': [(wp['name'], [float(c) for c in wp['coords']]) for wp in waypoints or []],
+            'places': [
+                (place.get('name'), place.get('rating'), place.get('address'), [float(c) for c in place['coords']])
+                for place in places or []
+            ]
+        }
+        digest.update(json.dumps(markers, default=str).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def get_route_map_html(self, route, start_coords, end_coords, waypoints=None, places=None):
+        """Serialized route map, built only when the route, stops or places change"""
+        key = self.route_map_key(route, start_coords, end_coords, waypoints, places)
+        html = _map_html_cache.get(key)
+        if html is None:
+            html = self.render_route_map_html(route, start_coords, end_coords, waypoints, places)
+            _map_html_cache.set(key, html)
+        return html
+    
+    def render_route_map_html(self, route, start_coords, end_coords, waypoints=None, places=None):
+        """Serialized route map, built fresh; for one-off maps that shouldn't take cache space"""
+        route_map = self.create_route_map(route, start_coords, end_coords, waypoints, places)
+        with timed('map_render'):
+            return route_map.get_root().render()
     
+    @timed('map_build')
     def create_route_map(self, route, start_coords, end_coords, waypoints=None, places=None):
         """Create an interactive map with the route and places"""
         try:
@@ -344,9 +749,9 @@ class GoogleMapsServices:
             )
             
             # Add route polyline
-            if route and route.get('polyline_points'):
+            if route and len(route.points) > 0:
                 folium.PolyLine(
-                    locations=route['polyline_points'],
+                    locations=self.simplify_route_points(route),
                     color='#4CAF50',
                     weight=4,
                     opacity=0.8,
@@ -377,7 +782,9 @@ class GoogleMapsServices:
                     ).add_to(route_map)
             
             # Add discovered places
-            if places:
+            if places and len(places) > MAP_BULK_MARKER_THRESHOLD:
+                self.add_place_cluster(route_map, places)
+            elif places:
                 for place in places:
                     folium.Marker(
                         location=place['coords'],
@@ -0,0 +1,65 @@
+"""
+Memoized route-generation stages for ScenicSync
+
+Generating a route is a small dependency graph:
+
+    geocode(name) -> directions(stops, avoid_highways) -> search_points(route, radius)
+                                                       -> places_search(point, type, radius)
+
+Each stage's key is a hash of its own inputs, and a downstream stage takes the
+upstream result itself (a route's points, a search point) as input. So changing
+an input invalidates exactly the stages below it: adding a place type only runs
+the searches for that type, and a new radius reuses the route. Geocoding is
+memoized by the persistent geocode cache; the other stages live here, in
+bounded in-memory LRUs shared by every session.
+"""
+import hashlib
+import json
+import numpy as np
+from config import *
+from cache import MemoryCache
+
+
+def coords_key(points):
+    """Coordinates rounded to about 10 cm, so float noise doesn't change a key"""
+    return np.round(np.asarray(points, dtype=np.float64), 6).tolist()
+
+
+def route_points_key(route_points):
+    """Content hash of a route's points, the input its downstream stages depend on"""
+    return hashlib.sha1(np.ascontiguousarray(route_points, dtype=np.float64).tobytes()).hexdigest()
+
+
+class Stage:
+    """One memoized stage: results keyed by a content hash of the stage's inputs"""
+
+    def __init__(self, name, max_entries, ttl_seconds=STAGE_CACHE_TTL):
+        self.name = name
+        self.cache = MemoryCache(name, max_entries, ttl_seconds)
+
+    def key(self, *inputs):
+        """Content hash of JSON-serializable inputs"""
+        return hashlib.sha1(json.dumps(inputs, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value)
+
+    def run(self, key, compute):
+        """The memoized value for key, computing and storing it on a miss; None results aren't stored"""
+        value = self.cache.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.cache.set(key, value)
+        return value
+
+    def clear(self):
+        self.cache.clear()
+
+
+directions_stage = Stage('directions', DIRECTIONS_STAGE_MAX_ENTRIES)
+search_points_stage = Stage('search_points', SEARCH_POINTS_STAGE_MAX_ENTRIES)
+places_search_stage = Stage('places_search', PLACES_SEARCH_STAGE_MAX_ENTRIES)
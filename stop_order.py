@@ -0,0 +1,110 @@
+"""
+Stop ordering for multi-stop routes
+
+Orders the intermediate stops of a trip with fixed start and end points to
+shorten the total great-circle distance: nearest-neighbour construction, then
+2-opt and Or-opt moves until neither finds an improvement. Each pass scores
+every candidate move at once on the distance matrix.
+"""
+import numpy as np
+from geo import distance_matrix_km
+
+IMPROVEMENT_EPSILON_KM = 1e-9
+MAX_OR_OPT_SEGMENT = 3
+
+
+def path_length(distances, path):
+    """Total length of a path of matrix indices"""
+    return float(distances[path[:-1], path[1:]].sum())
+
+
+def nearest_neighbour_path(distances):
+    """Path from index 0 to the last index, always driving to the closest unvisited stop"""
+    size = len(distances)
+    path = [0]
+    unvisited = np.ones(size, dtype=bool)
+    unvisited[[0, size - 1]] = False
+    for _ in range(size - 2):
+        candidates = np.flatnonzero(unvisited)
+        nearest = candidates[np.argmin(distances[path[-1], candidates])]
+        path.append(nearest)
+        unvisited[nearest] = False
+    path.append(size - 1)
+    return np.array(path)
+
+
+def best_two_opt(distances, path):
+    """(gain, i, j) of the best reversal of path[i:j + 1], keeping both ends fixed"""
+    inner = np.arange(1, len(path) - 1)
+    before, first = path[inner - 1], path[inner]
+    last, after = path[inner], path[inner + 1]
+
+    # delta[i, j] for reversing the segment from inner[i] to inner[j]
+    delta = (distances[before[:, None], last[None, :]] + distances[first[:, None], after[None, :]] -
+             distances[before, first][:, None] - distances[last, after][None, :])
+    delta[np.tril_indices(len(inner))] = 0.0
+
+    i, j = np.unravel_index(np.argmin(delta), delta.shape)
+    return -delta[i, j], inner[i], inner[j]
+
+
+def best_or_opt(distances, path, segment_length):
+    """(gain, start, destination edge, reversed) of the best move of a segment_length run of stops"""
+    size = len(path)
+    starts = np.arange(1, size - segment_length)
+    if len(starts) == 0:
+        return 0.0, 0, 0, False
+    ends = starts + segment_length - 1
+    before, first, last, after = path[starts - 1], path[starts], path[ends], path[ends + 1]
+    removal_gain = distances[before, first] + distances[last, after] - distances[before, after]
+
+    edges = np.arange(size - 1)
+    edge_from, edge_to = path[edges], path[edges + 1]
+    edge_length = distances[edge_from, edge_to][None, :]
+    forward = distances[edge_from[None, :], first[:, None]] + distances[last[:, None], edge_to[None, :]] - edge_length
+    backward = distances[edge_from[None, :], last[:, None]] + distances[first[:, None], edge_to[None, :]] - edge_length
+
+    # The segment cannot be reinserted into an edge touching itself
+    touching = (edges[None, :] >= starts[:, None] - 1) & (edges[None, :] <= ends[:, None])
+    forward[touching] = np.inf
+    backward[touching] = np.inf
+
+    delta = np.minimum(forward, backward) - removal_gain[:, None]
+    s, e = np.unravel_index(np.argmin(delta), delta.shape)
+    return -delta[s, e], starts[s], edges[e], backward[s, e] < forward[s, e]
+
+
+def apply_or_opt(path, start, edge, segment_length, reverse):
+    segment = path[start:start + segment_length]
+    if reverse:
+        segment = segment[::-1]
+    rest = np.concatenate((path[:start], path[start + segment_length:]))
+    # The destination edge index shifts left if it came after the removed segment
+    insert_at = edge + 1 if edge < start else edge + 1 - segment_length
+    return np.concatenate((rest[:insert_at], segment, rest[insert_at:]))
+
+
+def optimize_stop_order(start_coords, stops, end_coords, max_passes=1000):
+    """Indices into stops giving a short drive from start_coords to end_coords through all of them"""
+    if len(stops) < 2:
+        return list(range(len(stops)))
+
+    distances = distance_matrix_km([start_coords] + list(stops) + [end_coords])
+    path = nearest_neighbour_path(distances)
+
+    for _ in range(max_passes):
+        gain, i, j = best_two_opt(distances, path)
+        if gain > IMPROVEMENT_EPSILON_KM:
+            path[i:j + 1] = path[i:j + 1][::-1]
+            continue
+
+        best = max(
+            (best_or_opt(distances, path, length) + (length,) for length in range(1, MAX_OR_OPT_SEGMENT + 1)),
+            key=lambda move: move[0]
+        )
+        if best[0] <= IMPROVEMENT_EPSILON_KM:
+            break
+        gain, start, edge, reverse, length = best
+        path = apply_or_opt(path, start, edge, length, reverse)
+
+    return [int(index) - 1 for index in path[1:-1]]
@@ -0,0 +1,49 @@
+"""
+Lookup tests for the memory-mapped offline gazetteer
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gazetteer import Gazetteer, build_index
+
+SEED_ROWS = """name,state,lat,lng,aliases
+Portsmouth,NH,43.0717,-70.7625,
+Kansas City,MO,39.0997,-94.5786,
+Portland,OR,45.5152,-122.6784,
+Portland,ME,43.6591,-70.2568,
+Norfolk,VA,36.8508,-76.2859,
+"""
+
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    seed_path = tmp_path / "places.csv"
+    seed_path.write_text(SEED_ROWS, encoding="utf-8")
+    index_path = str(tmp_path / "places.idx")
+    build_index([('seed', str(seed_path))], index_path)
+    return Gazetteer(index_path)
+
+
+def test_exact_lookup_normalizes_state(gazetteer):
+    assert gazetteer.lookup("Portland, Maine, USA") == [43.6591, -70.2568]
+    assert gazetteer.lookup("Portsmouth, VA") is None
+
+
+def test_fuzzy_lookup_tolerates_typos_within_the_state(gazetteer):
+    assert gazetteer.fuzzy_lookup("Portsmoth, NH") == [43.0717, -70.7625]
+    assert gazetteer.fuzzy_lookup("Portlnd, OR") == [45.5152, -122.6784]
+    assert gazetteer.fuzzy_lookup("Portlnd, ME") == [43.6591, -70.2568]
+
+
+@pytest.mark.parametrize("place_name", ["Portsmouth, VA", "Kansas City, KS", "Portsmoth, Virginia"])
+def test_fuzzy_lookup_never_crosses_states(gazetteer, place_name):
+    assert gazetteer.fuzzy_lookup(place_name) is None
+
+
+def test_fuzzy_lookup_without_state_matches_full_names(gazetteer):
+    assert gazetteer.fuzzy_lookup("kansas city, mo") == [39.0997, -94.5786]
+    assert gazetteer.fuzzy_lookup("portsmouth nh") == [43.0717, -70.7625]
@@ -0,0 +1,99 @@
+"""
+Round-trip and equivalence tests for the vectorized polyline codec
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from polyline import count_points, decode_polylines, encode_polyline
+from services import GoogleMapsServices
+
+
+def reference_decode(encoded):
+    """The original scalar decoder, called without building a full service"""
+    return np.array(GoogleMapsServices.decode_polyline(GoogleMapsServices.__new__(GoogleMapsServices), encoded))
+
+
+def random_path(rng, size):
+    """A random walk of lat/lng points, quantized to the polyline precision"""
+    start = rng.uniform([-80, -179], [80, 179])
+    steps = rng.normal(scale=rng.choice([1e-4, 1e-2, 1.0]), size=(size, 2))
+    points = np.clip(start + np.cumsum(steps, axis=0), [-90, -180], [90, 180])
+    return np.round(points, 5)
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(20240101)
+
+
+def test_matches_reference_decoder(rng):
+    for _ in range(200):
+        encoded = encode_polyline(random_path(rng, int(rng.integers(1, 300))))
+        np.testing.assert_allclose(decode_polylines(encoded), reference_decode(encoded), rtol=0, atol=1e-9)
+
+
+def test_encode_round_trip(rng):
+    for _ in range(200):
+        points = random_path(rng, int(rng.integers(1, 300)))
+        encoded = encode_polyline(points)
+        np.testing.assert_allclose(decode_polylines(encoded), points, rtol=0, atol=1e-9)
+        assert count_points(encoded) == len(points)
+
+
+def test_extreme_coordinates_round_trip():
+    points = np.array([[90.0, 180.0], [-90.0, -180.0], [0.0, 0.0], [-0.00001, 0.00001], [89.99999, -179.99999]])
+    np.testing.assert_allclose(decode_polylines(encode_polyline(points)), points, rtol=0, atol=1e-9)
+
+
+def test_multiple_polylines_concatenate_absolute_points(rng):
+    # Each polyline's deltas restart from zero, so every later one needs its own offset removed
+    paths = [random_path(rng, int(rng.integers(1, 50))) for _ in range(25)]
+    encoded = [encode_polyline(path) for path in paths]
+
+    decoded = decode_polylines(encoded)
+    np.testing.assert_allclose(decoded, np.concatenate(paths), rtol=0, atol=1e-9)
+    np.testing.assert_allclose(decoded, np.concatenate([reference_decode(p) for p in encoded]), rtol=0, atol=1e-9)
+
+
+def test_empty_strings_are_skipped_among_polylines(rng):
+    first, second = random_path(rng, 5), random_path(rng, 7)
+    decoded = decode_polylines(["", encode_polyline(first), "", encode_polyline(second), ""])
+    np.testing.assert_allclose(decoded, np.concatenate([first, second]), rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("empty", ["", [], [""], ["", ""]])
+def test_empty_input(empty):
+    decoded = decode_polylines(empty)
+    assert decoded.shape == (0, 2)
+    assert decoded.dtype == np.float64
+
+
+def test_encode_empty():
+    assert encode_polyline([]) == ""
+    assert encode_polyline(np.empty((0, 2))) == ""
+
+
+def test_truncated_mid_value_raises(rng):
+    encoded = encode_polyline(random_path(rng, 10))
+    # Find a cut that leaves the last character with its continuation bit set
+    cut = next(i for i in range(len(encoded) - 1, 0, -1) if ord(encoded[i - 1]) - 63 >= 0x20)
+    with pytest.raises(ValueError):
+        decode_polylines(encoded[:cut])
+
+
+def test_truncated_after_latitude_raises():
+    # A complete latitude with its longitude missing leaves an odd number of values
+    encoded = encode_polyline([[38.5, -120.2], [40.7, -120.95]])
+    lat_only = encoded[:len(encode_polyline([[38.5, -120.2]]))] + "_ulL"
+    with pytest.raises(ValueError):
+        decode_polylines(lat_only)
+
+
+def test_invalid_character_raises():
+    with pytest.raises(ValueError):
+        decode_polylines("_p~iF~ps|U \x7f")
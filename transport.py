@@ -0,0 +1,232 @@
+"""
+Shared HTTP transport for Google Maps API calls
+"""
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from config import *
+from quota import QuotaLedger, QuotaExceeded, TokenBucket
+from metrics import record_api_call, registry
+
+# Endpoint name -> URL, used by every layer that needs to tell calls apart
+GOOGLE_ENDPOINTS = {
+    'geocode': GOOGLE_GEOCODING_URL,
+    'directions': GOOGLE_DIRECTIONS_URL,
+    'nearby_search': GOOGLE_PLACES_URL,
+    'details': GOOGLE_PLACE_DETAILS_URL
+}
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def is_throttled(response):
+    """Whether a response is worth retrying: a 429/5xx, or a 200 whose body reports OVER_QUERY_LIMIT
+
+    Google's web service APIs mostly signal throttling in the JSON status, not the HTTP status.
+    """
+    if response.status_code in RETRY_STATUS_CODES:
+        return True
+    # Only parse bodies that can hold the status, so normal replies aren't decoded twice
+    if response.status_code != 200 or b'OVER_QUERY_LIMIT' not in response.content:
+        return False
+    try:
+        data = response.json()
+    except ValueError:
+        return False
+    return isinstance(data, dict) and data.get('status') == 'OVER_QUERY_LIMIT'
+
+
+class _Call:
+    """One in-flight call that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one shared in-flight call"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """Run func for key, or wait for and share the result of a running call"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+def request_key(endpoint, params):
+    """Normalized identity of a request, so trivially different params coalesce"""
+    normalized = []
+    for name, value in params.items():
+        value = " ".join(str(value).split())
+        if name == 'address':
+            value = value.lower()
+        normalized.append((name, value))
+    return (endpoint, tuple(sorted(normalized)))
+
+
+class GoogleTransport:
+    """Pooled keep-alive session with jittered exponential backoff on 429/5xx"""
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, max_retries=HTTP_MAX_RETRIES):
+        self.max_retries = max_retries
+        self.single_flight = SingleFlight() if SINGLE_FLIGHT_ENABLED else None
+        self.rate_limiters = {endpoint: TokenBucket(ENDPOINT_QPS.get(endpoint, 0)) for endpoint in GOOGLE_ENDPOINTS}
+        self.ledger = QuotaLedger()
+        self.recorder = None
+        self.player = None
+        if HTTP_FIXTURE_MODE in ('record', 'replay'):
+            # Imported here because fixtures builds on this module's request keys
+            from fixtures import FixtureRecorder, FixturePlayer
+            if HTTP_FIXTURE_MODE == 'record':
+                self.recorder = FixtureRecorder(HTTP_FIXTURE_PATH)
+            else:
+                self.player = FixturePlayer(HTTP_FIXTURE_PATH, HTTP_FIXTURE_REPLAY_LATENCY)
+        self.session = requests.Session()
+        # All Google endpoints share one host, so a single large pool is what matters
+        adapter = HTTPAdapter(pool_connections=len(GOOGLE_ENDPOINTS), pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, endpoint, params):
+        """GET a Google endpoint by name, sharing identical in-flight requests"""
+        if self.single_flight is None:
+            return self.fetch(endpoint, params)
+
+        led = []
+
+        def lead():
+            led.append(True)
+            return self.fetch(endpoint, params)
+
+        response = self.single_flight.do(request_key(endpoint, params), lead)
+        if not led:
+            registry.inc('scenicsync_singleflight_shared_total', {'endpoint': endpoint})
+        return response
+
+    def fetch(self, endpoint, params):
+        """GET a Google endpoint by name, retrying transient failures"""
+        url = GOOGLE_ENDPOINTS[endpoint]
+        timeout = (HTTP_CONNECT_TIMEOUT, ENDPOINT_TIMEOUTS.get(endpoint, REQUEST_TIMEOUT))
+
+        attempt = 0
+        while True:
+            try:
+                response = self.send(endpoint, url, params, timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                delay = self.retry_delay(attempt, failed=True)
+                if delay is None:
+                    raise
+            else:
+                delay = self.retry_delay(attempt, response)
+                if delay is None:
+                    return response
+
+            time.sleep(delay)
+            attempt += 1
+
+    def retry_delay(self, attempt, response=None, failed=False):
+        """Seconds to wait before retrying an attempt, or None to return its response (or raise its error)"""
+        if failed:
+            # A missing recording will not appear on retry
+            if self.player is not None or attempt >= self.max_retries:
+                return None
+            return self.backoff_delay(attempt)
+
+        if not is_throttled(response) or attempt >= self.max_retries:
+            return None
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return min(int(retry_after), HTTP_BACKOFF_MAX)
+        return self.backoff_delay(attempt)
+
+    def send(self, endpoint, url, params, timeout):
+        """Make one attempt: served from fixtures in replay mode, otherwise live and billable"""
+        if self.player is not None:
+            return self.replay(endpoint, params)
+
+        self.charge(endpoint)
+        self.rate_limiters[endpoint].acquire()
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, params=params, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            record_api_call(endpoint, time.perf_counter() - start, 'error')
+            raise
+        self.record_live_call(endpoint, params, response, time.perf_counter() - start)
+        return response
+
+    def replay(self, endpoint, params):
+        """Serve one attempt from the recorded fixtures"""
+        start = time.perf_counter()
+        response = self.player.play(endpoint, params)
+        record_api_call(endpoint, time.perf_counter() - start, response.status_code)
+        return response
+
+    def charge(self, endpoint):
+        """Charge one live attempt to the spend budgets, raising QuotaExceeded once they are spent"""
+        # Every attempt is a billable request, so retries go through the limits too
+        try:
+            self.ledger.charge(endpoint)
+        except QuotaExceeded:
+            registry.inc('scenicsync_quota_rejections_total', {'endpoint': endpoint})
+            raise
+
+    def record_live_call(self, endpoint, params, response, seconds):
+        """Account for one completed live attempt, recording it in record mode"""
+        record_api_call(endpoint, seconds, response.status_code)
+        if self.recorder is not None:
+            self.recorder.record(endpoint, params, response, seconds)
+
+    def has_budget(self, endpoint):
+        """Whether the spend budgets still allow a call to endpoint"""
+        return self.replaying or self.ledger.has_budget(endpoint)
+
+    @property
+    def replaying(self):
+        """Whether responses come from recorded fixtures instead of Google"""
+        return self.player is not None
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff delay for the given retry attempt"""
+        return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """Get the process-wide transport shared by every GoogleMapsServices instance"""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = GoogleTransport()
+    return _transport
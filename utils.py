@@ -3,6 +3,7 @@ Utility functions for ScenicSync
 """
 import streamlit as st
 from urllib.parse import quote
+from metrics import registry, cache_hit_ratios
 
 def apply_custom_css():
     """Apply custom CSS styling to the app"""
@@ -196,4 +197,53 @@ def get_scenic_routes():
                 {"name": "Los Angeles, CA", "coords": [34.0522, -118.2437], "description": "Entertainment capital with diverse culture"}
             ]
         }
-    } 
\ No newline at end of file
+    }
+
+def render_debug_panel():
+    """Show stage latencies, API call stats and cache hit rates from the metrics registry"""
+    with st.expander("📊 Performance"):
+        st.write("**Stage latency**")
+        stage_rows = []
+        for labels, (count, p50, p95, total) in sorted(registry.histogram_summary('scenicsync_stage_seconds').items()):
+            stage_rows.append({
+                'Stage': dict(labels)['stage'],
+                'Runs': count,
+                'p50 (ms)': round(p50 * 1000, 1),
+                'p95 (ms)': round(p95 * 1000, 1)
+            })
+        if stage_rows:
+            st.table(stage_rows)
+        else:
+            st.caption("No stages recorded yet")
+        
+        st.write("**Google API calls**")
+        api_rows = []
+        for labels, (count, p50, p95, total) in sorted(registry.histogram_summary('scenicsync_api_request_seconds').items()):
+            endpoint = dict(labels)['endpoint']
+            api_rows.append({
+                'Endpoint': endpoint,
+                'Requests': count,
+                'Errors': registry.counter_value('scenicsync_api_errors_total', endpoint=endpoint),
+                'Shared': registry.counter_value('scenicsync_singleflight_shared_total', endpoint=endpoint),
+                'p50 (ms)': round(p50 * 1000, 1),
+                'p95 (ms)': round(p95 * 1000, 1)
+            })
+        if api_rows:
+            st.table(api_rows)
+        else:
+            st.caption("No API calls yet")
+        
+        st.write("**Cache hit rate**")
+        ratios = cache_hit_ratios()
+        if ratios:
+            for cache, ratio in ratios.items():
+                st.write(f"{cache}: {ratio:.0%}")
+        else:
+            st.caption("No cache lookups yet")
+        
+        st.download_button(
+            "Download Prometheus metrics",
+            registry.render_prometheus(),
+            file_name="scenicsync_metrics.prom",
+            mime="text/plain"
+        )